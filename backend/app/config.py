@@ -34,7 +34,7 @@ class Settings(BaseSettings):
     
     # Export settings
     csv_encoding: str = "utf-8"
-    excel_engine: str = "openpyxl"
+    excel_engine: str = "xlsxwriter"
     
     # File upload settings
     max_upload_size: int = 10 * 1024 * 1024  # 10MB
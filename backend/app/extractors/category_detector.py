@@ -1,32 +1,40 @@
 import json
 from pathlib import Path
-from typing import List, Dict, Any
-from sentence_transformers import SentenceTransformer
+from typing import List, Dict, Any, Optional
 import numpy as np
+from app.utils.lazy_loader import embed_batch
 
 class CategoryDetector:
     def __init__(self):
-        self.sentence_model = SentenceTransformer('all-MiniLM-L6-v2')
-        
         # Load product schemas
         schema_path = Path(__file__).resolve().parent.parent / "schemas" / "product_schema.json"
         with open(schema_path, "r") as f:
             self.schemas = json.load(f)
         
-        # Pre-compute category embeddings
-        self.category_embeddings = self._compute_category_embeddings()
+        # Category embeddings are computed on first use with the shared sentence model
+        self._category_embeddings: Optional[Dict[str, np.ndarray]] = None
+    
+    @property
+    def category_embeddings(self) -> Dict[str, np.ndarray]:
+        self.load_embeddings()
+        return self._category_embeddings
+    
+    def load_embeddings(self) -> None:
+        """
+        Compute the category embeddings (a sentence-model forward pass) unless already cached
+        """
+        if self._category_embeddings is None:
+            self._category_embeddings = self._compute_category_embeddings()
     
     def _compute_category_embeddings(self) -> Dict[str, np.ndarray]:
         """
-        Pre-compute embeddings for each category
+        Pre-compute embeddings for each category in one batched pass
         """
-        embeddings = {}
-        for category in self.schemas["categories"]:
-            # Combine category name and keywords
-            text = f"{category['category_name']} {' '.join(category['keywords'])}"
-            embedding = self.sentence_model.encode([text])[0]
-            embeddings[category["category_id"]] = embedding
-        return embeddings
+        categories = self.schemas["categories"]
+        # Combine category name and keywords
+        texts = [f"{category['category_name']} {' '.join(category['keywords'])}" for category in categories]
+        embeddings = embed_batch(texts)
+        return {category["category_id"]: embedding for category, embedding in zip(categories, embeddings)}
     
     def detect_category(
         self, 
@@ -1,21 +1,25 @@
 from PIL import Image
 import torch
 import io
-from typing import Dict, Any, List, Tuple, Optional
+from typing import Callable, Dict, Any, List, Tuple, Optional
 import numpy as np
 from sklearn.cluster import KMeans
 import colorsys
-from app.utils.lazy_loader import get_device, get_blip_models, get_clip_models
+import os
+from concurrent.futures import ThreadPoolExecutor
+from app.utils.lazy_loader import get_device, get_blip_models, get_clip_models, get_clip_text_embeddings, move_inputs
+
+# Model-free image analyses (numpy/sklearn, mostly GIL-releasing) run here while the
+# calling thread drives BLIP/CLIP
+_analysis_executor = ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1),
+                                        thread_name_prefix="image-analysis")
 
 
 class ImageExtractor:
     def __init__(self):
-        # Device detection (do not load models at import time)
+        # Device detection (do not load models at import time). Models are fetched from
+        # the loader on each use rather than kept here, so unloading them frees memory.
         self.device = get_device()
-        self.blip_processor = None
-        self.blip_model = None
-        self.clip_processor = None
-        self.clip_model = None
         
         # Comprehensive color detection with more colors and variations
         self.color_names = {
@@ -127,36 +131,42 @@ class ImageExtractor:
         """
         image = Image.open(io.BytesIO(image_bytes)).convert('RGB')
         
+        # Start the analyses that need no model; they overlap with the model work below
+        # Comprehensive color analysis
+        color_future = _analysis_executor.submit(self._comprehensive_color_analysis, image)
+        # Texture and pattern analysis
+        texture_future = _analysis_executor.submit(self._analyze_texture_patterns, image)
+        # Composition analysis
+        composition_future = _analysis_executor.submit(self._analyze_composition, image)
+        # Quality assessment
+        quality_future = _analysis_executor.submit(self._assess_image_quality, image)
+        # Brand/logo detection hints
+        brand_future = _analysis_executor.submit(self._detect_brand_hints, image)
+        
         # Basic image properties
         image_properties = self._extract_image_properties(image)
         
         # Generate multiple captions for richer description
         captions = self._generate_comprehensive_captions(image)
         
-        # Extract visual features with CLIP
-        visual_features = self._extract_visual_features(image)
+        # Encode the image with CLIP once; visual features and object detection share it
+        clip_image_embeds = self._encode_image_clip(image)
         
-        # Comprehensive color analysis
-        color_analysis = self._comprehensive_color_analysis(image)
+        # Extract visual features with CLIP
+        visual_features = self._extract_visual_features(clip_image_embeds)
         
         # Advanced object detection
-        detected_objects = self._detect_objects_comprehensive(image)
+        detected_objects = self._detect_objects_comprehensive(clip_image_embeds)
         
-        # Texture and pattern analysis
-        texture_analysis = self._analyze_texture_patterns(image)
-        
-        # Composition analysis
-        composition = self._analyze_composition(image)
-        
-        # Quality assessment
-        quality_metrics = self._assess_image_quality(image)
+        color_analysis = color_future.result()
+        texture_analysis = texture_future.result()
+        composition = composition_future.result()
+        quality_metrics = quality_future.result()
+        brand_hints = brand_future.result()
         
         # Material inference from visual cues
         inferred_materials = self._infer_materials(image, detected_objects)
         
-        # Brand/logo detection hints
-        brand_hints = self._detect_brand_hints(image)
-        
         # Aggregate all features
         return {
             "image_properties": image_properties,
@@ -210,44 +220,41 @@ class ImageExtractor:
             "mode": image.mode
         }
     
+    @torch.inference_mode()
     def _generate_comprehensive_captions(self, image: Image) -> List[str]:
         """Generate multiple detailed captions"""
         captions = []
         
         # Lazy-load BLIP models if needed
-        if self.blip_processor is None or self.blip_model is None:
-            try:
-                proc, model = get_blip_models()
-                self.blip_processor = proc
-                self.blip_model = model.to(self.device)
-            except Exception as e:
-                print(f"BLIP load error: {e}")
-                return ["Product image"]
+        try:
+            blip_processor, blip_model = get_blip_models()
+        except Exception as e:
+            print(f"BLIP load error: {e}")
+            return ["Product image"]
         
         try:
+            # Preprocess once; every generation below reads the same pixel values
+            inputs = blip_processor(image, return_tensors="pt")
+            inputs = move_inputs(inputs, blip_model)
+            
             # Generate multiple captions with different parameters
             for max_length in [30, 50, 75]:
-                inputs = self.blip_processor(image, return_tensors="pt")
-                inputs = {k: v.to(self.device) for k, v in inputs.items()}
-                
                 # Generate with different temperatures for variety
                 for temperature in [0.7, 1.0]:
-                    out = self.blip_model.generate(
+                    out = blip_model.generate(
                         **inputs, 
                         max_length=max_length,
                         temperature=temperature,
                         do_sample=True,
                         top_p=0.9
                     )
-                    caption = self.blip_processor.decode(out[0], skip_special_tokens=True)
+                    caption = blip_processor.decode(out[0], skip_special_tokens=True)
                     if caption and caption not in captions:
                         captions.append(caption)
             
             # Also generate a deterministic caption
-            inputs = self.blip_processor(image, return_tensors="pt")
-            inputs = {k: v.to(self.device) for k, v in inputs.items()}
-            out = self.blip_model.generate(**inputs, max_length=50)
-            caption = self.blip_processor.decode(out[0], skip_special_tokens=True)
+            out = blip_model.generate(**inputs, max_length=50)
+            caption = blip_processor.decode(out[0], skip_special_tokens=True)
             if caption and caption not in captions:
                 captions.append(caption)
                 
@@ -257,6 +264,36 @@ class ImageExtractor:
         
         return captions[:5]  # Return up to 5 unique captions
     
+    def caption_streamer(self, image_bytes: bytes, max_new_tokens: int = 30) -> Tuple[Any, Callable[[], None]]:
+        """
+        Prepare a streamed BLIP caption: returns (streamer, generate). Calling generate
+        loads BLIP and runs it, and iterating the streamer yields text as tokens are
+        decoded, so the two must run on different threads. All model work happens in
+        generate, so it can be queued with the other model jobs. max_new_tokens stays
+        short since BLIP tends to overshoot a product-title length caption.
+        """
+        from transformers import TextIteratorStreamer
+        
+        image = Image.open(io.BytesIO(image_bytes)).convert('RGB')
+        # The tokenizer is attached once generate has loaded BLIP; the streamer only
+        # needs it to decode tokens
+        streamer = TextIteratorStreamer(None, skip_special_tokens=True)
+        
+        def generate():
+            try:
+                blip_processor, blip_model = get_blip_models()
+                streamer.tokenizer = blip_processor.tokenizer
+                # inference_mode is thread-local, so enter it on the generating thread
+                with torch.inference_mode():
+                    inputs = move_inputs(blip_processor(image, return_tensors="pt"), blip_model)
+                    blip_model.generate(**inputs, max_new_tokens=max_new_tokens, streamer=streamer)
+            except Exception:
+                # Unblock the reader; otherwise it waits for text that never comes
+                streamer.end()
+                raise
+        
+        return streamer, generate
+    
     def _comprehensive_color_analysis(self, image: Image) -> Dict[str, Any]:
         """Perform comprehensive color analysis"""
         # Resize for faster processing
@@ -385,8 +422,9 @@ class ImageExtractor:
         else:
             return "mixed"
     
-    def _detect_objects_comprehensive(self, image: Image) -> Dict[str, Any]:
-        """Comprehensive object detection"""
+    @torch.inference_mode()
+    def _detect_objects_comprehensive(self, image_embeds: Optional[torch.Tensor]) -> Dict[str, Any]:
+        """Comprehensive object detection from the image's CLIP embedding"""
         detected = {
             "primary_objects": [],
             "secondary_objects": [],
@@ -395,39 +433,23 @@ class ImageExtractor:
             "total_objects_detected": 0
         }
         
-        # Lazy-load CLIP models if needed
-        if self.clip_processor is None or self.clip_model is None:
-            try:
-                proc, model = get_clip_models()
-                self.clip_processor = proc
-                self.clip_model = model.to(self.device)
-            except Exception as e:
-                print(f"CLIP load error: {e}")
-                return detected
+        if image_embeds is None:
+            return detected
         
         try:
-            # Process in batches for efficiency
+            # Label embeddings are fixed, so they are encoded once and cached; only
+            # the image is encoded per request. Same logits as CLIPModel.forward.
+            _, clip_model = get_clip_models()
+            text_embeds = get_clip_text_embeddings(tuple(self.object_labels))
+            image_embeds = image_embeds / image_embeds.norm(dim=-1, keepdim=True)
+            logits_per_image = clip_model.logit_scale.exp() * image_embeds @ text_embeds.T
+            
+            # Scores are softmaxed over groups of 20 labels, as the thresholds below expect
             batch_size = 20
             all_scores = []
-            
             for i in range(0, len(self.object_labels), batch_size):
-                batch_labels = self.object_labels[i:i+batch_size]
-                
-                inputs = self.clip_processor(
-                    text=batch_labels,
-                    images=image,
-                    return_tensors="pt",
-                    padding=True
-                )
-                inputs = {k: v.to(self.device) for k, v in inputs.items()}
-                
-                outputs = self.clip_model(**inputs)
-                logits_per_image = outputs.logits_per_image
-                probs = logits_per_image.softmax(dim=1)
-                
-                # Store scores
-                batch_scores = probs[0].detach().cpu().tolist()
-                all_scores.extend(batch_scores)
+                probs = logits_per_image[:, i:i+batch_size].softmax(dim=1)
+                all_scores.extend(probs[0].detach().cpu().tolist())
             
             # Sort objects by confidence
             object_scores = list(zip(self.object_labels, all_scores))
@@ -736,23 +758,26 @@ class ImageExtractor:
         
         return brand_hints
     
-    def _extract_visual_features(self, image: Image) -> List[float]:
-        """Extract CLIP visual features"""
+    @torch.inference_mode()
+    def _encode_image_clip(self, image: Image) -> Optional[torch.Tensor]:
+        """CLIP image embedding on the model's device, or None if CLIP is unavailable"""
         # Lazy-load CLIP models if needed
-        if self.clip_processor is None or self.clip_model is None:
-            try:
-                proc, model = get_clip_models()
-                self.clip_processor = proc
-                self.clip_model = model.to(self.device)
-            except Exception as e:
-                print(f"CLIP load error: {e}")
-                return []
+        try:
+            clip_processor, clip_model = get_clip_models()
+        except Exception as e:
+            print(f"CLIP load error: {e}")
+            return None
 
         try:
-            inputs = self.clip_processor(images=image, return_tensors="pt")
-            inputs = {k: v.to(self.device) for k, v in inputs.items()}
-            image_features = self.clip_model.get_image_features(**inputs)
-            return image_features.detach().cpu().numpy().flatten().tolist()
+            inputs = clip_processor(images=image, return_tensors="pt")
+            inputs = move_inputs(inputs, clip_model)
+            return clip_model.get_image_features(**inputs)
         except Exception as e:
             print(f"Visual feature extraction error: {e}")
-            return []
\ No newline at end of file
+            return None
+    
+    def _extract_visual_features(self, image_embeds: Optional[torch.Tensor]) -> List[float]:
+        """Extract CLIP visual features"""
+        if image_embeds is None:
+            return []
+        return image_embeds.detach().cpu().numpy().flatten().tolist()
\ No newline at end of file
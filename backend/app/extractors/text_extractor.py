@@ -1,15 +1,14 @@
 import re
 from typing import Dict, List, Any
-from app.utils.lazy_loader import get_sentence_transformer, get_ner_pipeline, get_roberta_model_and_tokenizer
+from app.utils.lazy_loader import embed_batch, get_sentence_transformer, get_ner_pipeline, get_roberta_model_and_tokenizer, ner_batch
 
 
 class TextExtractor:
     def __init__(self):
-        # Lazy-loaded models
-        self.ner_model = None
+        # Lazy-loaded models; the NER and sentence models are fetched from the loader
+        # on each use rather than kept here, so unloading them frees memory
         self.attribute_tokenizer = None
         self.attribute_model = None
-        self.sentence_model = None
 
         # Regex patterns for common attributes
         self.patterns = {
@@ -35,15 +34,9 @@ class TextExtractor:
         pattern_features = self._extract_patterns(cleaned_text)
         
         # Semantic features (lazy load sentence model)
-        if self.sentence_model is None:
-            try:
-                self.sentence_model = get_sentence_transformer()
-            except Exception:
-                self.sentence_model = None
-
         embeddings = None
-        if self.sentence_model is not None:
-            embeddings = self.sentence_model.encode([cleaned_text])[0]
+        if self._load_sentence_model() is not None:
+            embeddings = embed_batch([cleaned_text], normalize=False)[0]
         else:
             embeddings = []
         
@@ -59,6 +52,56 @@ class TextExtractor:
             "raw_text": text
         }
     
+    def extract_features_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """
+        Extract features from several posts, running each model once over the whole batch
+        """
+        if not texts:
+            return []
+
+        cleaned_texts = [self._clean_text(text) for text in texts]
+
+        # Named Entity Recognition in batched forward passes
+        entities_batch = self._extract_entities_batch(cleaned_texts)
+
+        # Semantic features in batched forward passes (embed_batch bounds the batch size)
+        if self._load_sentence_model() is not None:
+            embeddings_batch = embed_batch(cleaned_texts, normalize=False).tolist()
+        else:
+            embeddings_batch = [[] for _ in cleaned_texts]
+
+        return [
+            {
+                "cleaned_text": cleaned_text,
+                "entities": entities,
+                "pattern_features": self._extract_patterns(cleaned_text),
+                "keywords": self._extract_keywords(cleaned_text),
+                "embeddings": embeddings,
+                "raw_text": text
+            }
+            for text, cleaned_text, entities, embeddings in zip(
+                texts, cleaned_texts, entities_batch, embeddings_batch
+            )
+        ]
+    
+    def _load_sentence_model(self):
+        """
+        Lazy-load the sentence embedding model (None if it cannot be loaded)
+        """
+        try:
+            return get_sentence_transformer()
+        except Exception:
+            return None
+    
+    def _load_ner_model(self):
+        """
+        Lazy-load the NER tokenizer and model (None if they cannot be loaded)
+        """
+        try:
+            return get_ner_pipeline()
+        except Exception:
+            return None
+    
     def _clean_text(self, text: str) -> str:
         """
         Clean social media text
@@ -79,16 +122,22 @@ class TextExtractor:
         """
         Extract named entities using BERT NER (lazy-loaded)
         """
-        if self.ner_model is None:
-            try:
-                self.ner_model = get_ner_pipeline()
-            except Exception:
-                self.ner_model = None
-
-        if self.ner_model is None:
-            return []
+        return self._extract_entities_batch([text])[0]
+    
+    def _extract_entities_batch(self, texts: List[str]) -> List[List[Dict]]:
+        """
+        Extract named entities for several texts in one forward pass
+        """
+        if self._load_ner_model() is None:
+            return [[] for _ in texts]
 
-        entities = self.ner_model(text)
+        results = ner_batch(texts)
+        return [self._format_entities(entities) for entities in results]
+    
+    def _format_entities(self, entities: List[Dict]) -> List[Dict]:
+        """
+        Normalize grouped NER output into entity/word/score dicts
+        """
         return [
             {
                 "entity": ent.get("entity_group") or ent.get("entity"),
@@ -1,6 +1,8 @@
 import re
 from typing import Dict, List, Any
 
+from app.utils.phrase_matcher import PhraseMatcher
+
 class ComplianceValidator:
     """
     Validates listings against Amazon's compliance rules and style guidelines
@@ -24,6 +26,10 @@ class ComplianceValidator:
             "money back", "risk free", "no risk"
         ]
         
+        # Matchers scan for every phrase in a single pass
+        self._banned_matcher = PhraseMatcher(self.banned_words)
+        self._promotional_matcher = PhraseMatcher(self.promotional_phrases)
+        
         # Required title format rules
         self.title_rules = {
             "max_length": 200,
@@ -263,13 +269,10 @@ class ComplianceValidator:
             listing.get("description", ""),
             " ".join(listing.get("bullets", [])),
             " ".join(listing.get("search_terms", []))
-        ]).lower()
+        ])
         
         # Check banned words
-        found_banned = []
-        for word in self.banned_words:
-            if word in all_text:
-                found_banned.append(word)
+        found_banned = self._banned_matcher.find_all(all_text)
         
         if found_banned:
             results["errors"].append(
@@ -277,10 +280,7 @@ class ComplianceValidator:
             )
         
         # Check promotional phrases
-        found_promotional = []
-        for phrase in self.promotional_phrases:
-            if phrase in all_text:
-                found_promotional.append(phrase)
+        found_promotional = self._promotional_matcher.find_all(all_text)
         
         if found_promotional:
             results["warnings"].append(
@@ -321,8 +321,7 @@ class ComplianceValidator:
         Auto-fix common title issues
         """
         # Remove banned words
-        for word in self.banned_words:
-            title = re.sub(rf'\b{word}\b', '', title, flags=re.IGNORECASE)
+        title = self._banned_matcher.strip(title)
         
         # Fix capitalization
         title = self._apply_title_case(title)
@@ -345,8 +344,7 @@ class ComplianceValidator:
         Auto-fix bullet point issues
         """
         # Remove banned words
-        for word in self.banned_words:
-            bullet = re.sub(rf'\b{word}\b', '', bullet, flags=re.IGNORECASE)
+        bullet = self._banned_matcher.strip(bullet)
         
         # Ensure starts with capital
         if bullet:
@@ -375,8 +373,7 @@ class ComplianceValidator:
         description = re.sub(r'https?://\S+', '', description)
         
         # Remove banned words
-        for word in self.banned_words:
-            description = re.sub(rf'\b{word}\b', '', description, flags=re.IGNORECASE)
+        description = self._banned_matcher.strip(description)
         
         # Truncate if too long
         if len(description) > self.description_rules["max_length"]:
@@ -397,12 +394,7 @@ class ComplianceValidator:
         # Remove banned words
         cleaned_terms = []
         for term in search_terms:
-            is_clean = True
-            for banned in self.banned_words:
-                if banned in term.lower():
-                    is_clean = False
-                    break
-            if is_clean:
+            if not self._banned_matcher.find_all(term):
                 cleaned_terms.append(term.lower())
         
         # Ensure byte limit
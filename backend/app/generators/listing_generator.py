@@ -3,6 +3,38 @@ from pathlib import Path
 from typing import Dict, Any, List, Set, Tuple
 import re
 import random
+from functools import lru_cache
+
+from app.utils.phrase_matcher import PhraseMatcher
+
+# Only the brand and category name vary between generated descriptions
+_DESCRIPTION_TEMPLATE = (
+    "Introducing the {brand} {category_name} - a perfect blend of quality and innovation.\n"
+    "\n"
+    "This premium product features exceptional build quality with carefully selected materials \n"
+    "and thoughtful design. Every detail has been considered to deliver reliable performance \n"
+    "and user satisfaction.\n"
+    "\n"
+    "Key Features:\n"
+    "• Superior construction quality\n"
+    "• Optimized for daily use\n"
+    "• Professional-grade materials\n"
+    "• Versatile functionality\n"
+    "• Long-lasting durability\n"
+    "\n"
+    "Whether for professional or personal use, this {category_lower} delivers \n"
+    "the quality and features you need. Experience the difference that attention to \n"
+    "detail makes."
+)
+
+
+@lru_cache(maxsize=256)
+def _format_description(brand: str, category_name: str) -> str:
+    return _DESCRIPTION_TEMPLATE.format(
+        brand=brand,
+        category_name=category_name,
+        category_lower=category_name.lower()
+    )
 
 
 class ListingGenerator:
@@ -16,6 +48,7 @@ class ListingGenerator:
             "best", "#1", "number one", "top", "free shipping", 
             "guarantee", "warranty", "sale", "discount", "cheap"
         ]
+        self._banned_matcher = PhraseMatcher(self.banned_words)
         
         # Categories for bullet diversity
         self.bullet_categories = [
@@ -656,26 +689,7 @@ class ListingGenerator:
         category_name = schema["category_name"]
         brand = attributes.get("brand", "our")
         
-        description = f"""
-Introducing the {brand} {category_name} - a perfect blend of quality and innovation.
-
-This premium product features exceptional build quality with carefully selected materials 
-and thoughtful design. Every detail has been considered to deliver reliable performance 
-and user satisfaction.
-
-Key Features:
-• Superior construction quality
-• Optimized for daily use
-• Professional-grade materials
-• Versatile functionality
-• Long-lasting durability
-
-Whether for professional or personal use, this {category_name.lower()} delivers 
-the quality and features you need. Experience the difference that attention to 
-detail makes.
-        """
-        
-        return description.strip()
+        return _format_description(str(brand), category_name)
     
     def _generate_extensive_search_terms(self, features: Dict, attributes: Dict, schema: Dict) -> List[str]:
         """Generate search terms"""
@@ -737,8 +751,7 @@ detail makes.
     def _ensure_compliance(self, text: str, max_length: int) -> str:
         """Ensure text meets Amazon compliance"""
         # Remove banned words
-        for banned in self.banned_words:
-            text = re.sub(rf'\b{banned}\b', '', text, flags=re.IGNORECASE)
+        text = self._banned_matcher.strip(text)
         
         # Remove extra spaces
         text = re.sub(r'\s+', ' ', text).strip()
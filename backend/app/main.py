@@ -1,23 +1,47 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Request
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, JSONResponse, RedirectResponse
+from fastapi.responses import StreamingResponse, JSONResponse, RedirectResponse, Response
 from fastapi.encoders import jsonable_encoder
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
 from typing import List, Optional, Union
 import json
+import os
+import secrets
+import orjson
 from pathlib import Path
 from pydantic import BaseModel
 import io
 import numpy as np
-import traceback
+import logging
+import asyncio
+import time
+from contextlib import asynccontextmanager
 
 from app.extractors.text_extractor import TextExtractor
 from app.extractors.image_extractor import ImageExtractor
 from app.extractors.category_detector import CategoryDetector
 from app.generators.listing_generator import ListingGenerator
+from app.generators.compliance_validator import ComplianceValidator
 from app.utils.fusion_layer import MultimodalFusion
 from app.utils.export_handler import ExportHandler
+from app.utils.lazy_loader import configure_cpu_threads, loaded_models, unload, warmup
+from app.utils.model_queue import ModelQueue
+from app.schemas.models import BatchListingRequest, BatchListingResponse, ListingResponse
 
-app = FastAPI(title="Amazon Listing Generator")
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load models (see AUTOLIST_PRELOAD) before the first request instead of during it."""
+    # The test suite mocks the extractors, so it skips the multi-gigabyte loads
+    if not os.getenv("AUTOLIST_TEST_MODE"):
+        configure_cpu_threads()
+        await run_in_threadpool(warmup)
+    model_queue.start()
+    yield
+    await model_queue.stop()
+
+app = FastAPI(title="Amazon Listing Generator", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -37,11 +61,50 @@ category_detector = CategoryDetector()
 listing_generator = ListingGenerator()
 fusion_layer = MultimodalFusion()
 export_handler = ExportHandler()
+compliance_validator = ComplianceValidator()
+
+# Model-bound work from every endpoint goes through one consumer, one job at a time
+model_queue = ModelQueue()
 
 class GenerateListingRequest(BaseModel):
     text_content: str
     detected_category: Optional[str] = None
 
+def extract_text_features(texts: List[str]) -> List[dict]:
+    """
+    Batch function for the model queue: text features for posts from concurrent requests
+    """
+    if len(texts) == 1:
+        return [text_extractor.extract_features(texts[0])]
+    return text_extractor.extract_features_batch(texts)
+
+def run_generation(text_features: dict, image_bytes: List[bytes], detected_category: Optional[str]):
+    """
+    Model pipeline behind /generate; returns (category, listing, combined_features)
+    """
+    # Step 2: Extract image features if provided
+    image_features = [image_extractor.extract_features(img_bytes) for img_bytes in image_bytes]
+    
+    # Step 3: Detect product category
+    if detected_category:
+        category = detected_category
+    else:
+        category = category_detector.detect_category(
+            text_features, 
+            image_features
+        )
+    
+    # Step 4: Fuse multimodal features
+    combined_features = fusion_layer.fuse_features(
+        text_features, 
+        image_features, 
+        category
+    )
+    
+    # Step 5: Generate listing
+    listing = listing_generator.generate(combined_features, category)
+    return category, listing, combined_features
+
 @app.post("/generate")
 async def generate_listing(
     request: Request,
@@ -65,37 +128,16 @@ async def generate_listing(
         else:
             images_list = images if isinstance(images, list) else ([images] if images else [])
 
-        # Step 1: Extract text features
         if not text_content:
             raise HTTPException(status_code=422, detail="Missing 'text_content' field")
-        text_features = text_extractor.extract_features(text_content)
-        
-        # Step 2: Extract image features if provided (only supports binary uploads)
-        image_features = []
-        for upload in images_list:
-            img_bytes = await upload.read()
-            img_features = image_extractor.extract_features(img_bytes)
-            image_features.append(img_features)
-        
-        # Step 3: Detect product category
-        if detected_category:
-            category = detected_category
-        else:
-            category = category_detector.detect_category(
-                text_features, 
-                image_features
-            )
-        
-        # Step 4: Fuse multimodal features
-        combined_features = fusion_layer.fuse_features(
-            text_features, 
-            image_features, 
-            category
+        # Read uploads up front (only supports binary uploads); the models run in a queued job
+        image_bytes = [await upload.read() for upload in images_list]
+        # Step 1: Extract text features, coalesced with other requests arriving alongside this one
+        text_features = await model_queue.run_batched(extract_text_features, text_content)
+        category, listing, combined_features = await model_queue.run(
+            run_generation, text_features, image_bytes, detected_category
         )
         
-        # Step 5: Generate listing
-        listing = listing_generator.generate(combined_features, category)
-        
         response_content = {
             "success": True,
             "category": category,
@@ -113,12 +155,7 @@ async def generate_listing(
                 return tuple(sanitize(v) for v in obj)
             if isinstance(obj, np.ndarray):
                 return obj.tolist()
-            if isinstance(obj, (np.floating, np.floating.__class__)):
-                try:
-                    return float(obj)
-                except Exception:
-                    return obj.item() if hasattr(obj, 'item') else obj
-            # numpy scalar
+            # numpy scalar (covers np.floating, np.integer, np.bool_)
             if isinstance(obj, np.generic):
                 return obj.item()
             return obj
@@ -132,12 +169,129 @@ async def generate_listing(
             if isinstance(e, HTTPException):
                 raise
 
-            tb = traceback.format_exc()
-            err_content = {"success": False, "error": str(e), "traceback": tb}
-            # Also print to stderr for server logs
-            print(tb)
+            # Traceback goes to the server log only; formatting is deferred to the logging handler
+            logger.exception("generate failed")
+            err_content = {"success": False, "error": str(e)}
             return JSONResponse(status_code=500, content=jsonable_encoder(err_content))
 
+@app.post("/generate_batch", response_model=BatchListingResponse)
+async def generate_listing_batch(batch: BatchListingRequest):
+    """
+    Generate listings for several text posts, running text models once over the whole batch
+    """
+    start_time = time.perf_counter()
+    posts = batch.posts
+
+    # Step 1: Extract text features for every post in one batched, queued pass
+    all_text_features = await model_queue.run(
+        text_extractor.extract_features_batch,
+        [post.text_content for post in posts]
+    )
+
+    # The first detection embeds the categories with the sentence model; do that as a
+    # queued job so build_listing below stays model-free
+    if any(not post.detected_category for post in posts):
+        await model_queue.run(category_detector.load_embeddings)
+
+    def build_listing(post, text_features):
+        category = post.detected_category or category_detector.detect_category(text_features, [])
+        combined_features = fusion_layer.fuse_features(text_features, [], category)
+        listing = listing_generator.generate(combined_features, category)
+        if post.auto_fix_compliance:
+            listing = compliance_validator.auto_fix(listing)
+        return ListingResponse(
+            success=True,
+            category=category,
+            title=listing["title"],
+            bullets=listing["bullets"],
+            description=listing["description"],
+            search_terms=listing["search_terms"],
+            attributes=listing["attributes"],
+            confidence_scores=combined_features["confidence_scores"]
+        )
+
+    # Steps 2-4: Post-process each post in worker threads
+    semaphore = asyncio.Semaphore(batch.max_workers if batch.parallel_processing else 1)
+
+    async def process(post, text_features):
+        async with semaphore:
+            return await asyncio.to_thread(build_listing, post, text_features)
+
+    results = await asyncio.gather(
+        *(process(post, text_features) for post, text_features in zip(posts, all_text_features)),
+        return_exceptions=True
+    )
+
+    listings = []
+    errors = []
+    for index, result in enumerate(results):
+        if isinstance(result, Exception):
+            errors.append({"index": str(index), "error": str(result)})
+        else:
+            listings.append(result)
+
+    return BatchListingResponse(
+        success=not errors,
+        total_processed=len(posts),
+        successful=len(listings),
+        failed=len(errors),
+        listings=listings,
+        errors=errors,
+        processing_time_seconds=time.perf_counter() - start_time
+    )
+
+@app.post("/caption/stream")
+async def stream_caption(image: UploadFile = File(...)):
+    """
+    Stream a BLIP caption for one image as plain text while it is generated
+    """
+    image_bytes = await image.read()
+    try:
+        # Only decodes the image; loading and running BLIP happen in the queued generate job
+        streamer, generate = await run_in_threadpool(image_extractor.caption_streamer, image_bytes)
+    except Exception as e:
+        logger.exception("caption stream failed")
+        return JSONResponse(status_code=500, content={"success": False, "error": str(e)})
+
+    # Generation takes its turn on the model queue; the response reads the streamer meanwhile
+    generation = asyncio.create_task(model_queue.run(generate))
+
+    def end_stream_on_failure(task: asyncio.Task):
+        # A job cancelled before it ran (e.g. queue shutdown) never ends the streamer
+        # itself, and the reader thread would wait on it forever
+        if task.cancelled() or task.exception() is not None:
+            streamer.end()
+
+    generation.add_done_callback(end_stream_on_failure)
+
+    async def chunks():
+        try:
+            async for chunk in iterate_in_threadpool(streamer):
+                yield chunk
+        finally:
+            await asyncio.wait([generation])
+            if generation.cancelled():
+                logger.warning("caption generation was cancelled before it finished")
+            elif generation.exception() is not None:
+                logger.error("caption generation failed", exc_info=generation.exception())
+
+    return StreamingResponse(chunks(), media_type="text/plain")
+
+@app.post("/admin/unload/{name}")
+async def unload_model(name: str, x_admin_token: Optional[str] = Header(None)):
+    """
+    Drop a cached model (sbert, ner, blip, clip or roberta) and free its memory;
+    it reloads on next use. Only available when AUTOLIST_ADMIN_TOKEN is set, and
+    the request must send it in the X-Admin-Token header.
+    """
+    admin_token = os.getenv("AUTOLIST_ADMIN_TOKEN")
+    if not admin_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token, admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    unloaded = await run_in_threadpool(unload, name)
+    return {"success": unloaded, "loaded_models": [kind for kind, _ in loaded_models()]}
+
 @app.get("/categories")
 async def get_categories():
     """
@@ -158,7 +312,7 @@ async def root():
 async def export_listing(payload: dict):
     """
     Export the generated listing in specified format.
-    Accepts a JSON body { "listing": {...}, "format": "json" | "csv" }
+    Accepts a JSON body { "listing": {...}, "format": "json" | "csv", "pretty": true/false }
     """
     # Support both direct listing in body or nested payload
     listing = payload.get('listing', payload)
@@ -173,7 +327,11 @@ async def export_listing(payload: dict):
             }
         )
     else:
-        return listing
+        # Encode once with orjson rather than going through jsonable_encoder
+        options = orjson.OPT_SERIALIZE_NUMPY
+        if payload.get('pretty', False):
+            options |= orjson.OPT_INDENT_2
+        return Response(content=orjson.dumps(listing, option=options), media_type="application/json")
 
 @app.post("/validate")
 async def validate_listing(payload: dict):
@@ -181,15 +339,13 @@ async def validate_listing(payload: dict):
     Validate listing against Amazon compliance rules.
     Accepts a JSON body { "listing": {...}, "auto_fix": true/false }
     """
-    from app.generators.compliance_validator import ComplianceValidator
-    validator = ComplianceValidator()
     # Support nested payload as well as raw listing
     listing = payload.get('listing', payload)
     auto_fix = payload.get('auto_fix', False)
 
     if auto_fix:
-        return validator.auto_fix(listing)
+        return compliance_validator.auto_fix(listing)
 
-    validation_result = validator.validate(listing)
+    validation_result = compliance_validator.validate(listing)
     return validation_result
 
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 
@@ -7,22 +7,19 @@ class GenerateListingRequest(BaseModel):
     """
     Request model for generating a listing
     """
+    # Whitespace is stripped before the length checks, so blank text is rejected
+    model_config = ConfigDict(str_strip_whitespace=True)
+    
     text_content: str = Field(..., min_length=10, max_length=2000)
     detected_category: Optional[str] = None
     auto_fix_compliance: bool = True
-    
-    @validator('text_content')
-    def validate_text_content(cls, v):
-        if not v.strip():
-            raise ValueError('Text content cannot be empty')
-        return v
 
 class ExportRequest(BaseModel):
     """
     Request model for exporting a listing
     """
     listing: Dict[str, Any]
-    format: str = Field(default="json", regex="^(json|csv|excel)$")
+    format: str = Field(default="json", pattern="^(json|csv|excel)$")
     include_validation: bool = False
 
 class ValidationRequest(BaseModel):
@@ -153,7 +150,8 @@ class BatchListingRequest(BaseModel):
     """
     Request for batch listing generation
     """
-    posts: List[GenerateListingRequest]
+    # Bounded so one request cannot monopolise the models; larger jobs are split client-side
+    posts: List[GenerateListingRequest] = Field(..., min_length=1, max_length=100)
     parallel_processing: bool = True
     max_workers: int = Field(default=4, ge=1, le=10)
 
@@ -1,9 +1,35 @@
-import json
 import csv
 import io
-from typing import Dict, Any, List, Optional
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Any, Iterator, List, Optional, TextIO, Tuple
 from datetime import datetime
-import pandas as pd
+from functools import lru_cache
+from itertools import zip_longest
+
+import orjson
+
+from app.utils.phrase_matcher import PhraseMatcher
+
+# Attributes with dedicated flat-file columns, excluded from other_attributes
+_OTHER_ATTR_SKIP = frozenset({'brand', 'size', 'color', 'material', 'target_audience'})
+
+
+def _other_attributes_cell(attributes: Dict[str, Any]) -> str:
+    """
+    Serialize the attributes without a dedicated column, with sorted keys so the
+    cell is stable regardless of attribute insertion order
+    """
+    other = {k: v for k, v in attributes.items() if k not in _OTHER_ATTR_SKIP}
+    return orjson.dumps(other, option=orjson.OPT_SORT_KEYS).decode()
+
+
+@lru_cache(maxsize=256)
+def _pretty_label(key: str) -> str:
+    """
+    Human-readable label for a snake_case key ('target_audience' -> 'Target Audience')
+    """
+    return key.replace('_', ' ').title()
 
 # PDF generation imports
 try:
@@ -61,32 +87,50 @@ class ExportHandler:
             "category",
             "optimization_score"
         ]
+        self._metadata_columns = {"generated_date", "model_version", "category", "optimization_score"}
+        
+        # Compiled row builders, keyed by (column layout, include_metadata)
+        self._column_expressions = self._build_column_expressions()
+        self._row_functions: Dict[Tuple[Tuple[str, ...], bool], Callable] = {}
+        
+        # PDF styles are built once and shared by every report
+        if PDF_AVAILABLE:
+            self._build_pdf_styles()
+        
+        # Per-thread output buffer reused across PDF builds
+        self._tls = threading.local()
+        
+        # Words flagged during export validation
+        self.banned_words = ["best", "#1", "guaranteed", "free shipping"]
+        self._banned_matcher = PhraseMatcher(self.banned_words)
     
     def to_csv(self, listing: Dict[str, Any], include_metadata: bool = True) -> str:
         """
         Convert listing to comprehensive CSV format
         """
-        output = io.StringIO()
-        writer = csv.DictWriter(output, fieldnames=self.csv_columns)
-        writer.writeheader()
-        
-        row = self._map_to_csv_row(listing, include_metadata)
-        writer.writerow(row)
-        
-        return output.getvalue()
+        return self.to_csv_multiple([listing], include_metadata)
     
-    def to_csv_multiple(self, listings: List[Dict[str, Any]], include_metadata: bool = True) -> str:
+    def to_csv_multiple(self, listings: List[Dict[str, Any]], include_metadata: bool = True,
+                        file: Optional[TextIO] = None) -> Optional[str]:
         """
         Convert multiple listings to comprehensive CSV format
+
+        When file is given (opened with newline=''), rows are written straight to it
+        and None is returned, avoiding an in-memory copy of the whole export
         """
-        output = io.StringIO()
-        writer = csv.DictWriter(output, fieldnames=self.csv_columns)
-        writer.writeheader()
-        
-        for listing in listings:
-            row = self._map_to_csv_row(listing, include_metadata)
-            writer.writerow(row)
+        output = file if file is not None else io.StringIO(newline='')
+        writer = csv.writer(output)
+        writer.writerow(self.csv_columns)
+        
+        # One clock read and one row-function lookup for the whole export rather than per row
+        row_function = self._row_function(include_metadata)
+        with self._batch_clock() as now:
+            today = now.strftime('%Y-%m-%d')
+            for listing in listings:
+                writer.writerow(self._csv_row_values(listing, row_function, today))
         
+        if file is not None:
+            return None
         return output.getvalue()
     
     def to_detailed_csv(self, listings: List[Dict[str, Any]]) -> str:
@@ -96,21 +140,24 @@ class ExportHandler:
         if not listings:
             return ""
         
+        # Flatten each listing once; the rows are reused for both the header and the body
+        flattened_rows = [self._flatten_dict(listing) for listing in listings]
+        
         # Collect all possible fields from all listings
         all_fields = set()
-        for listing in listings:
-            all_fields.update(self._flatten_dict(listing).keys())
+        for flattened in flattened_rows:
+            all_fields.update(flattened)
         
         # Sort fields for consistent ordering
-        fieldnames = sorted(list(all_fields))
+        fieldnames = sorted(all_fields)
         
         output = io.StringIO()
-        writer = csv.DictWriter(output, fieldnames=fieldnames)
-        writer.writeheader()
-        
-        for listing in listings:
-            flattened = self._flatten_dict(listing)
-            writer.writerow(flattened)
+        writer = csv.writer(output)
+        writer.writerow(fieldnames)
+        writer.writerows(
+            [flattened.get(field, "") for field in fieldnames]
+            for flattened in flattened_rows
+        )
         
         return output.getvalue()
     
@@ -121,40 +168,15 @@ class ExportHandler:
         if not PDF_AVAILABLE:
             raise ImportError("reportlab is required for PDF generation. Install with: pip install reportlab")
         
-        buffer = io.BytesIO()
+        buffer = self._pdf_buffer()
         doc = SimpleDocTemplate(buffer, pagesize=letter, rightMargin=72, leftMargin=72,
                               topMargin=72, bottomMargin=18)
         
         # Container for PDF elements
         elements = []
-        styles = getSampleStyleSheet()
-        
-        # Custom styles
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            textColor=colors.HexColor('#1a1a1a'),
-            spaceAfter=30,
-            alignment=TA_CENTER
-        )
-        
-        heading_style = ParagraphStyle(
-            'CustomHeading',
-            parent=styles['Heading2'],
-            fontSize=16,
-            textColor=colors.HexColor('#2c3e50'),
-            spaceAfter=12,
-            spaceBefore=12
-        )
-        
-        body_style = ParagraphStyle(
-            'CustomBody',
-            parent=styles['BodyText'],
-            fontSize=11,
-            alignment=TA_JUSTIFY,
-            spaceAfter=12
-        )
+        title_style = self._title_style
+        heading_style = self._heading_style
+        body_style = self._body_style
         
         # Header with generation info
         elements.append(Paragraph("Product Listing Report", title_style))
@@ -162,7 +184,7 @@ class ExportHandler:
         
         # Metadata table
         metadata = [
-            ['Generated', datetime.now().strftime('%Y-%m-%d %H:%M:%S')],
+            ['Generated', self._now().strftime('%Y-%m-%d %H:%M:%S')],
             ['Category', listing.get('category', 'N/A')],
             ['Model', listing.get('model_version', 'N/A')]
         ]
@@ -213,8 +235,7 @@ class ExportHandler:
         if 'attributes' in listing and listing['attributes']:
             elements.append(Paragraph("Product Attributes", heading_style))
             attr_data = [['Attribute', 'Value']]
-            for key, value in listing['attributes'].items():
-                attr_data.append([key.replace('_', ' ').title(), str(value)])
+            attr_data += [[_pretty_label(key), str(value)] for key, value in listing['attributes'].items()]
             
             attr_table = Table(attr_data, colWidths=[2.5*inch, 3.5*inch])
             attr_table.setStyle(TableStyle([
@@ -239,10 +260,10 @@ class ExportHandler:
             validation = listing.get('validation', {})
             if validation:
                 val_data = [['Check', 'Status', 'Details']]
-                for check, result in validation.items():
-                    status = '✓' if result.get('passed', True) else '✗'
-                    details = result.get('message', 'OK')
-                    val_data.append([check.replace('_', ' ').title(), status, details])
+                val_data += [
+                    [_pretty_label(check), '✓' if result.get('passed', True) else '✗', result.get('message', 'OK')]
+                    for check, result in validation.items()
+                ]
                 
                 val_table = Table(val_data, colWidths=[2*inch, 0.75*inch, 3.25*inch])
                 val_table.setStyle(TableStyle([
@@ -263,7 +284,7 @@ class ExportHandler:
                           'optimization_score', 'compliance', 'validation']:
                 if value and not isinstance(value, (dict, list)):
                     elements.append(Spacer(1, 0.1*inch))
-                    elements.append(Paragraph(f"<b>{key.replace('_', ' ').title()}:</b> {value}", body_style))
+                    elements.append(Paragraph(f"<b>{_pretty_label(key)}:</b> {value}", body_style))
         
         # Build PDF
         doc.build(elements)
@@ -277,18 +298,16 @@ class ExportHandler:
         if not PDF_AVAILABLE:
             raise ImportError("reportlab is required for PDF generation")
         
-        buffer = io.BytesIO()
+        buffer = self._pdf_buffer()
         doc = SimpleDocTemplate(buffer, pagesize=letter, rightMargin=72, leftMargin=72,
                               topMargin=72, bottomMargin=18)
         
         elements = []
-        styles = getSampleStyleSheet()
-        
-        title_style = ParagraphStyle('Title', parent=styles['Heading1'], 
-                                    fontSize=24, alignment=TA_CENTER, spaceAfter=30)
+        styles = self._pdf_styles
+        title_style = self._report_title_style
         
         elements.append(Paragraph(f"Product Listings Report - {len(listings)} Items", title_style))
-        elements.append(Paragraph(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", 
+        elements.append(Paragraph(f"Generated: {self._now().strftime('%Y-%m-%d %H:%M:%S')}", 
                                 styles['Normal']))
         elements.append(Spacer(1, 0.5*inch))
         
@@ -307,70 +326,80 @@ class ExportHandler:
         buffer.seek(0)
         return buffer.getvalue()
     
-    def to_json(self, listing: Dict[str, Any], pretty: bool = True) -> str:
+    def to_json(self, listing: Dict[str, Any], pretty: bool = True,
+                file: Optional[TextIO] = None) -> Optional[str]:
         """
         Convert listing to JSON format
+
+        When file is given the document is written to it and None is returned
         """
+        # numpy scalars (e.g. confidence scores) serialize without a sanitize pass
+        option = orjson.OPT_SERIALIZE_NUMPY
         if pretty:
-            return json.dumps(listing, indent=2, ensure_ascii=False)
-        return json.dumps(listing, ensure_ascii=False)
+            option |= orjson.OPT_INDENT_2
+        content = orjson.dumps(listing, option=option).decode()
+        
+        if file is not None:
+            file.write(content)
+            return None
+        return content
     
     def to_excel(self, listings: List[Dict[str, Any]]) -> bytes:
         """
         Convert listings to comprehensive Excel format with multiple sheets
         """
+        # pandas is only needed here; importing it lazily keeps it off the JSON/CSV paths
+        import pandas as pd
+        
         output = io.BytesIO()
         
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            # Main listings sheet
-            main_rows = []
-            for listing in listings:
-                row = {
-                    "Title": listing.get("title", ""),
-                    "Category": listing.get("category", ""),
-                    "Brand": listing.get("attributes", {}).get("brand", ""),
-                    "Description": listing.get("description", "")[:500],  # Truncate for Excel
-                    "Search Terms": ", ".join(listing.get("search_terms", [])),
-                    "Generated Date": listing.get("generated_date", datetime.now().strftime('%Y-%m-%d'))
-                }
-                
-                # Add bullets
-                for i, bullet in enumerate(listing.get("bullets", [])[:5], 1):
-                    row[f"Bullet {i}"] = bullet
-                
-                main_rows.append(row)
+        # xlsxwriter is a write-only engine and much faster than openpyxl here. constant_memory
+        # is left off: pandas emits cells column by column, which that mode would silently drop.
+        engine_kwargs = {'options': {'strings_to_formulas': False, 'strings_to_urls': False}}
+        with pd.ExcelWriter(output, engine='xlsxwriter', engine_kwargs=engine_kwargs) as writer:
+            # Main listings sheet, built column by column
+            today = self._now().strftime('%Y-%m-%d')
+            attributes = [listing.get("attributes", {}) for listing in listings]
+            main_columns = {
+                "Title": [listing.get("title", "") for listing in listings],
+                "Category": [listing.get("category", "") for listing in listings],
+                "Brand": [attrs.get("brand", "") for attrs in attributes],
+                "Description": [listing.get("description", "")[:500] for listing in listings],  # Truncate for Excel
+                "Search Terms": [", ".join(listing.get("search_terms", [])) for listing in listings],
+                "Generated Date": [listing.get("generated_date", today) for listing in listings]
+            }
+            
+            # Add bullets, one column per position up to the longest bullet list
+            bullet_columns = zip_longest(*(listing.get("bullets", [])[:5] for listing in listings))
+            for i, column in enumerate(bullet_columns, 1):
+                main_columns[f"Bullet {i}"] = column
             
-            df_main = pd.DataFrame(main_rows)
+            df_main = pd.DataFrame(main_columns)
             df_main.to_excel(writer, sheet_name='Listings', index=False)
             
             # Attributes sheet
-            attr_rows = []
-            for idx, listing in enumerate(listings, 1):
-                for key, value in listing.get("attributes", {}).items():
-                    attr_rows.append({
-                        "Listing #": idx,
-                        "Title": listing.get("title", "")[:50],
-                        "Attribute": key,
-                        "Value": str(value)
-                    })
+            titles_short = [listing.get("title", "")[:50] for listing in listings]
+            attr_records = [
+                (idx, title, key, str(value))
+                for idx, (title, attrs) in enumerate(zip(titles_short, attributes), 1)
+                for key, value in attrs.items()
+            ]
             
-            if attr_rows:
-                df_attr = pd.DataFrame(attr_rows)
+            if attr_records:
+                df_attr = pd.DataFrame.from_records(
+                    attr_records, columns=["Listing #", "Title", "Attribute", "Value"]
+                )
                 df_attr.to_excel(writer, sheet_name='Attributes', index=False)
             
             # Metadata sheet
-            meta_rows = []
-            for idx, listing in enumerate(listings, 1):
-                meta_rows.append({
-                    "Listing #": idx,
-                    "Title": listing.get("title", "")[:50],
-                    "Category": listing.get("category", ""),
-                    "Model Version": listing.get("model_version", ""),
-                    "Optimization Score": listing.get("optimization_score", ""),
-                    "Generated Date": listing.get("generated_date", "")
-                })
-            
-            df_meta = pd.DataFrame(meta_rows)
+            df_meta = pd.DataFrame({
+                "Listing #": range(1, len(listings) + 1),
+                "Title": titles_short,
+                "Category": main_columns["Category"],
+                "Model Version": [listing.get("model_version", "") for listing in listings],
+                "Optimization Score": [listing.get("optimization_score", "") for listing in listings],
+                "Generated Date": [listing.get("generated_date", "") for listing in listings]
+            })
             df_meta.to_excel(writer, sheet_name='Metadata', index=False)
         
         return output.getvalue()
@@ -383,26 +412,22 @@ class ExportHandler:
         warnings = []
         
         # Check required fields
-        required_fields = ["title", "bullets", "description", "category"]
-        for field in required_fields:
-            if field not in listing or not listing[field]:
-                errors.append(f"Missing required field: {field}")
+        errors.extend(self._missing_field_errors(listing))
+        
+        title = listing.get("title", "")
         
         # Check field lengths
-        if "title" in listing and len(listing["title"]) > 200:
-            errors.append(f"Title exceeds 200 characters: {len(listing['title'])}")
+        title_length = len(title)
+        if title_length > 200:
+            errors.append(f"Title exceeds 200 characters: {title_length}")
         
-        if "bullets" in listing:
-            for i, bullet in enumerate(listing["bullets"]):
-                if len(bullet) > 256:
-                    errors.append(f"Bullet {i+1} exceeds 256 characters: {len(bullet)}")
+        for i, bullet in enumerate(listing.get("bullets", ())):
+            bullet_length = len(bullet)
+            if bullet_length > 256:
+                errors.append(f"Bullet {i+1} exceeds 256 characters: {bullet_length}")
         
-        # Check for banned words
-        banned_words = ["best", "#1", "guaranteed", "free shipping"]
-        text_to_check = listing.get("title", "") + " " + listing.get("description", "")
-        for word in banned_words:
-            if word.lower() in text_to_check.lower():
-                warnings.append(f"Contains potentially banned word: {word}")
+        # Check for banned words (the matcher lowercases the text once and scans it in one pass)
+        warnings.extend(self._banned_word_warnings(title, listing.get("description", "")))
         
         return {
             "valid": len(errors) == 0,
@@ -410,71 +435,263 @@ class ExportHandler:
             "warnings": warnings
         }
     
-    def _map_to_csv_row(self, listing: Dict[str, Any], include_metadata: bool = True) -> Dict[str, str]:
+    def validate_export_many(self, listings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
-        Map listing data to comprehensive CSV row format
+        Validate multiple listings before export, checking field lengths for the whole batch at once
+        """
+        # numpy is only needed for batch validation
+        import numpy as np
+        
+        count = len(listings)
+        titles = [listing.get("title", "") for listing in listings]
+        bullet_lists = [listing.get("bullets", ()) for listing in listings]
+        
+        # Title lengths for every listing in one array
+        title_lengths = np.fromiter(map(len, titles), dtype=np.int64, count=count)
+        
+        # Flatten all bullets, remembering which listing and position each came from
+        bullet_counts = np.fromiter(map(len, bullet_lists), dtype=np.int64, count=count)
+        total_bullets = int(bullet_counts.sum())
+        bullet_lengths = np.fromiter(
+            (len(bullet) for bullets in bullet_lists for bullet in bullets),
+            dtype=np.int64, count=total_bullets
+        )
+        owners = np.repeat(np.arange(count), bullet_counts)
+        positions = np.arange(total_bullets) - np.repeat(np.cumsum(bullet_counts) - bullet_counts, bullet_counts)
+        
+        bullet_errors = [[] for _ in range(count)]
+        for idx in np.flatnonzero(bullet_lengths > 256).tolist():
+            bullet_errors[owners[idx]].append(
+                f"Bullet {positions[idx] + 1} exceeds 256 characters: {bullet_lengths[idx]}"
+            )
+        
+        long_titles = title_lengths > 200
+        
+        results = []
+        for i, listing in enumerate(listings):
+            errors = self._missing_field_errors(listing)
+            if long_titles[i]:
+                errors.append(f"Title exceeds 200 characters: {title_lengths[i]}")
+            errors.extend(bullet_errors[i])
+            
+            results.append({
+                "valid": len(errors) == 0,
+                "errors": errors,
+                "warnings": self._banned_word_warnings(titles[i], listing.get("description", ""))
+            })
+        
+        return results
+    
+    def _missing_field_errors(self, listing: Dict[str, Any]) -> List[str]:
+        """
+        Report required export fields that are absent or empty
+        """
+        required_fields = ["title", "bullets", "description", "category"]
+        return [
+            f"Missing required field: {field}"
+            for field in required_fields
+            if field not in listing or not listing[field]
+        ]
+    
+    def _banned_word_warnings(self, title: str, description: str) -> List[str]:
+        """
+        Warn about banned words in the title and description
+        """
+        return [
+            f"Contains potentially banned word: {word}"
+            for word in self._banned_matcher.find_all(title + " " + description)
+        ]
+    
+    def _csv_row_values(self, listing: Dict[str, Any], row_function: Callable[[Dict, Dict, List, str], List[Any]],
+                        today: str) -> List[Any]:
+        """
+        Compute the CSV cell values for a listing, in csv_columns order, with a row
+        function from _row_function. today ('YYYY-MM-DD') is the fallback date.
         """
         attributes = listing.get("attributes", {})
-        bullets = listing.get("bullets", [])
-        
-        row = {
-            "item_sku": listing.get("sku", f"SKU-{listing.get('category', 'ITEM')}-{datetime.now().strftime('%Y%m%d')}"),
-            "product-id": listing.get("product_id", ""),
-            "product-id-type": "ASIN",
-            "item_name": listing.get("title", ""),
-            "brand_name": attributes.get("brand", "Generic"),
-            "manufacturer": attributes.get("manufacturer", attributes.get("brand", "Generic")),
-            "product_description": listing.get("description", ""),
-            "bullet_point1": bullets[0] if len(bullets) > 0 else "",
-            "bullet_point2": bullets[1] if len(bullets) > 1 else "",
-            "bullet_point3": bullets[2] if len(bullets) > 2 else "",
-            "bullet_point4": bullets[3] if len(bullets) > 3 else "",
-            "bullet_point5": bullets[4] if len(bullets) > 4 else "",
-            "generic_keywords": ", ".join(listing.get("search_terms", [])),
-            "main_image_url": listing.get("images", {}).get("main", ""),
-            "other_image_url1": listing.get("images", {}).get("other_1", ""),
-            "other_image_url2": listing.get("images", {}).get("other_2", ""),
-            "other_image_url3": listing.get("images", {}).get("other_3", ""),
-            "parent_child": listing.get("parent_child", "standalone"),
-            "parent_sku": listing.get("parent_sku", ""),
-            "relationship_type": listing.get("relationship_type", ""),
-            "variation_theme": listing.get("variation_theme", ""),
-            "size_name": attributes.get("size", ""),
-            "color_name": attributes.get("color", ""),
-            "material_type": attributes.get("material", ""),
-            "product_tax_code": listing.get("tax_code", ""),
-            "item_type": listing.get("category", ""),
-            "target_audience": attributes.get("target_audience", ""),
-            "subject_matter": attributes.get("subject_matter", ""),
-            "other_attributes": json.dumps({k: v for k, v in attributes.items() 
-                                          if k not in ['brand', 'size', 'color', 'material', 'target_audience']})
-        }
+        # Pad so the five bullet columns can be read positionally
+        bullets = list(listing.get("bullets", [])) + [""] * 5
+        return row_function(listing, attributes, bullets, today)
+    
+    def _row_function(self, include_metadata: bool) -> Callable[[Dict, Dict, List, str], List[Any]]:
+        """
+        Return the compiled row builder for the current csv_columns, compiling it on first use
+        """
+        key = (tuple(self.csv_columns), include_metadata)
+        row_function = self._row_functions.get(key)
+        if row_function is None:
+            row_function = self._compile_row_function(*key)
+            self._row_functions[key] = row_function
+        return row_function
+    
+    def _compile_row_function(self, columns: Tuple[str, ...], include_metadata: bool) -> Callable:
+        """
+        Generate and compile a function that builds a whole row in one list display,
+        so each cell is an inline expression instead of a per-column getter call
+        """
+        cells = []
+        for column in columns:
+            if not include_metadata and column in self._metadata_columns:
+                cells.append('""')
+            else:
+                # Unknown columns are read straight from the listing
+                cells.append(self._column_expressions.get(column, f'listing.get({column!r}, "")'))
+        
+        source = (
+            "def _row(listing, attributes, bullets, today):\n"
+            "    images = listing.get('images', {})\n"
+            "    return [\n"
+            + "".join(f"        {cell},\n" for cell in cells)
+            + "    ]\n"
+        )
+        namespace = {"_other_attributes": _other_attributes_cell}
+        exec(compile(source, "<csv-row>", "exec"), namespace)
+        return namespace["_row"]
+    
+    def _build_column_expressions(self) -> Dict[str, str]:
+        """
+        Source expression per CSV column, evaluated with listing, attributes, bullets,
+        today and images in scope
+        """
+        def from_listing(key, default=""):
+            return f"listing.get({key!r}, {default!r})"
         
-        if include_metadata:
-            row.update({
-                "generated_date": listing.get("generated_date", datetime.now().strftime('%Y-%m-%d')),
-                "model_version": listing.get("model_version", ""),
-                "category": listing.get("category", ""),
-                "optimization_score": listing.get("optimization_score", "")
-            })
+        def from_attributes(key, default=""):
+            return f"attributes.get({key!r}, {default!r})"
         
-        return row
+        def from_images(key):
+            return f"images.get({key!r}, '')"
+        
+        return {
+            "item_sku": "listing['sku'] if 'sku' in listing else "
+                        "f\"SKU-{listing.get('category', 'ITEM')}-{today.replace('-', '')}\"",
+            "product-id": from_listing("product_id"),
+            "product-id-type": "'ASIN'",
+            "item_name": from_listing("title"),
+            "brand_name": from_attributes("brand", "Generic"),
+            "manufacturer": "attributes.get('manufacturer', attributes.get('brand', 'Generic'))",
+            "product_description": from_listing("description"),
+            "bullet_point1": "bullets[0]",
+            "bullet_point2": "bullets[1]",
+            "bullet_point3": "bullets[2]",
+            "bullet_point4": "bullets[3]",
+            "bullet_point5": "bullets[4]",
+            "generic_keywords": "', '.join(listing.get('search_terms', []))",
+            "main_image_url": from_images("main"),
+            "other_image_url1": from_images("other_1"),
+            "other_image_url2": from_images("other_2"),
+            "other_image_url3": from_images("other_3"),
+            "parent_child": from_listing("parent_child", "standalone"),
+            "parent_sku": from_listing("parent_sku"),
+            "relationship_type": from_listing("relationship_type"),
+            "variation_theme": from_listing("variation_theme"),
+            "size_name": from_attributes("size"),
+            "color_name": from_attributes("color"),
+            "material_type": from_attributes("material"),
+            "product_tax_code": from_listing("tax_code"),
+            "item_type": from_listing("category"),
+            "target_audience": from_attributes("target_audience"),
+            "subject_matter": from_attributes("subject_matter"),
+            "other_attributes": "_other_attributes(attributes)",
+            # Additional metadata
+            "generated_date": "listing.get('generated_date', today)",
+            "model_version": from_listing("model_version"),
+            "category": from_listing("category"),
+            "optimization_score": from_listing("optimization_score")
+        }
     
     def _flatten_dict(self, d: Dict[str, Any], parent_key: str = '', sep: str = '_') -> Dict[str, str]:
         """
         Flatten nested dictionary for CSV export
         """
-        items = []
-        for k, v in d.items():
-            new_key = f"{parent_key}{sep}{k}" if parent_key else k
-            if isinstance(v, dict):
-                items.extend(self._flatten_dict(v, new_key, sep=sep).items())
-            elif isinstance(v, list):
-                # Convert lists to comma-separated strings
-                items.append((new_key, ", ".join(str(x) for x in v)))
+        flattened = {}
+        # Explicit stack of (prefix, items iterator) instead of recursion; descending
+        # into a nested dict pauses its parent, so keys keep depth-first order
+        stack = [(parent_key, iter(d.items()))]
+        while stack:
+            prefix, items = stack[-1]
+            for k, v in items:
+                new_key = f"{prefix}{sep}{k}" if prefix else k
+                if isinstance(v, dict):
+                    stack.append((new_key, iter(v.items())))
+                    break
+                elif isinstance(v, list):
+                    # Convert lists to comma-separated strings
+                    flattened[new_key] = ", ".join(map(str, v))
+                else:
+                    flattened[new_key] = str(v) if v is not None else ""
             else:
-                items.append((new_key, str(v) if v is not None else ""))
-        return dict(items)
+                stack.pop()
+        return flattened
+    
+    def _build_pdf_styles(self):
+        """
+        Create the paragraph styles used by the PDF reports
+        """
+        self._pdf_styles = getSampleStyleSheet()
+        
+        self._title_style = ParagraphStyle(
+            'CustomTitle',
+            parent=self._pdf_styles['Heading1'],
+            fontSize=24,
+            textColor=colors.HexColor('#1a1a1a'),
+            spaceAfter=30,
+            alignment=TA_CENTER
+        )
+        
+        self._heading_style = ParagraphStyle(
+            'CustomHeading',
+            parent=self._pdf_styles['Heading2'],
+            fontSize=16,
+            textColor=colors.HexColor('#2c3e50'),
+            spaceAfter=12,
+            spaceBefore=12
+        )
+        
+        self._body_style = ParagraphStyle(
+            'CustomBody',
+            parent=self._pdf_styles['BodyText'],
+            fontSize=11,
+            alignment=TA_JUSTIFY,
+            spaceAfter=12
+        )
+        
+        self._report_title_style = ParagraphStyle('Title', parent=self._pdf_styles['Heading1'], 
+                                                  fontSize=24, alignment=TA_CENTER, spaceAfter=30)
+    
+    @contextmanager
+    def _batch_clock(self) -> Iterator[datetime]:
+        """
+        Freeze the export timestamp for the duration of the block, so several exports
+        of the same batch share one clock read. Nested blocks keep the outer timestamp.
+        """
+        outer = getattr(self._tls, "now", None)
+        if outer is not None:
+            yield outer
+            return
+        self._tls.now = datetime.now()
+        try:
+            yield self._tls.now
+        finally:
+            self._tls.now = None
+    
+    def _now(self) -> datetime:
+        """
+        Current time, or the frozen timestamp inside a _batch_clock block
+        """
+        frozen = getattr(self._tls, "now", None)
+        return frozen if frozen is not None else datetime.now()
+    
+    def _pdf_buffer(self) -> io.BytesIO:
+        """
+        Return this thread's PDF output buffer, emptied for reuse
+        """
+        buffer = getattr(self._tls, "pdf_buffer", None)
+        if buffer is None:
+            buffer = self._tls.pdf_buffer = io.BytesIO()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return buffer
     
     def _add_listing_to_elements(self, listing: Dict[str, Any], styles) -> List:
         """
@@ -488,8 +705,9 @@ class ExportHandler:
         
         if 'bullets' in listing:
             elements.append(Paragraph("<b>Features:</b>", body_style))
-            for bullet in listing['bullets']:
-                elements.append(Paragraph(f"• {bullet}", body_style))
+            # Separate paragraphs per bullet: a single <br/>-joined paragraph parses once but
+            # takes reportlab's slower multi-line breaking path, which costs more overall
+            elements.extend([Paragraph(f"• {bullet}", body_style) for bullet in listing['bullets']])
             elements.append(Spacer(1, 0.1*inch))
         
         if 'description' in listing:
@@ -1,6 +1,15 @@
 from typing import Dict, List, Any
+from collections import Counter
+from itertools import chain
+from statistics import fmean
 import numpy as np
 
+# Filler words ignored when pulling keywords out of image captions
+_STOPWORDS = frozenset({'with', 'this', 'that', 'from'})
+
+# Above this many colors, counting with np.unique beats building a Counter
+_NUMPY_COLOR_THRESHOLD = 64
+
 class MultimodalFusion:
     """
     Fuses features from text and image extractors to create a unified feature set
@@ -31,8 +40,11 @@ class MultimodalFusion:
         # Extract text-based attributes
         text_attributes = self._extract_text_attributes(text_features)
         
+        # Walk the images once; attributes, keywords and confidence all read this summary
+        image_summary = self._summarize_images(image_features)
+        
         # Extract image-based attributes
-        image_attributes = self._extract_image_attributes(image_features)
+        image_attributes = self._extract_image_attributes(image_summary)
         
         # Merge attributes with priority
         merged = self._merge_attributes(text_attributes, image_attributes)
@@ -40,12 +52,12 @@ class MultimodalFusion:
         
         # Extract keywords for search terms
         combined_features["all_keywords"] = self._combine_keywords(
-            text_features, image_features
+            text_features, image_summary
         )
         
         # Confidence scores
         combined_features["confidence_scores"] = self._calculate_confidence(
-            text_features, image_features
+            text_features, image_summary
         )
         
         return combined_features
@@ -78,37 +90,63 @@ class MultimodalFusion:
         
         return attributes
     
-    def _extract_image_attributes(self, image_features: List[Dict]) -> Dict[str, Any]:
+    def _summarize_images(self, image_features: List[Dict]) -> Dict[str, Any]:
         """
-        Extract structured attributes from image features
+        Aggregate everything the fusion steps need from the images in a single pass
         """
-        attributes = {}
-        
-        if not image_features:
-            return attributes
-        
-        # Aggregate from all images
+        # list.extend copies each image's items in C and beats appending them one by one from Python
         all_colors = []
         all_objects = []
         all_captions = []
+        caption_keywords = []
+        image_score = 0.0
         
         for img_feat in image_features:
+            if "caption" in img_feat:
+                all_captions.append(img_feat["caption"])
+                # Extract keywords from caption
+                important_words = [
+                    w for w in img_feat["caption"].lower().split()
+                    if len(w) > 3 and w not in _STOPWORDS
+                ]
+                caption_keywords.extend(important_words[:5])
+                image_score += 0.3
             if "dominant_colors" in img_feat:
                 all_colors.extend(img_feat["dominant_colors"])
+                image_score += 0.3
             if "object_tags" in img_feat:
                 all_objects.extend(img_feat["object_tags"])
-            if "caption" in img_feat:
-                all_captions.append(img_feat["caption"])
+                image_score += 0.4
+        
+        return {
+            "image_count": len(image_features),
+            "colors": all_colors,
+            "objects": all_objects,
+            "captions": all_captions,
+            "caption_keywords": caption_keywords,
+            "score": image_score
+        }
+    
+    def _extract_image_attributes(self, image_summary: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Extract structured attributes from the aggregated image features
+        """
+        attributes = {}
+        
+        if not image_summary["image_count"]:
+            return attributes
+        
+        all_colors = image_summary["colors"]
+        all_objects = image_summary["objects"]
+        all_captions = image_summary["captions"]
         
         # Most common color
         if all_colors:
-            from collections import Counter
-            color_counts = Counter(all_colors)
-            attributes["color"] = color_counts.most_common(1)[0][0]
+            attributes["color"] = self._most_common_color(all_colors)
         
-        # Primary objects
+        # Primary objects (deduplicated, keeping first-seen order)
         if all_objects:
-            attributes["detected_objects"] = list(set(all_objects))
+            attributes["detected_objects"] = list(dict.fromkeys(all_objects))
         
         # Combined caption insights
         if all_captions:
@@ -116,6 +154,19 @@ class MultimodalFusion:
         
         return attributes
     
+    def _most_common_color(self, colors: List[str]) -> str:
+        """
+        Return the most frequent color, ties going to the one seen first
+        """
+        if len(colors) <= _NUMPY_COLOR_THRESHOLD:
+            return Counter(colors).most_common(1)[0][0]
+        
+        values, first_index, counts = np.unique(
+            np.asarray(colors), return_index=True, return_counts=True
+        )
+        tied = np.flatnonzero(counts == counts.max())
+        return values[tied[first_index[tied].argmin()]].item()
+    
     def _merge_attributes(
         self, 
         text_attrs: Dict[str, Any], 
@@ -139,19 +190,19 @@ class MultimodalFusion:
         
         # Special handling for certain attributes
         if "detected_objects" in image_attrs and "text_keywords" in text_attrs:
-            # Combine both for richer context
-            all_context = list(set(
-                image_attrs.get("detected_objects", []) + 
+            # Combine both for richer context (deduplicated, keeping first-seen order)
+            all_context = dict.fromkeys(chain(
+                image_attrs.get("detected_objects", []),
                 text_attrs.get("text_keywords", [])
             ))
-            merged["context_keywords"] = all_context[:15]
+            merged["context_keywords"] = list(all_context)[:15]
         
         return merged
     
     def _combine_keywords(
         self, 
         text_features: Dict, 
-        image_features: List[Dict]
+        image_summary: Dict[str, Any]
     ) -> List[str]:
         """
         Combine keywords from all sources
@@ -162,25 +213,16 @@ class MultimodalFusion:
         if "keywords" in text_features:
             keywords.update(text_features["keywords"])
         
-        # From images
-        for img_feat in image_features:
-            if "object_tags" in img_feat:
-                keywords.update(img_feat["object_tags"])
-            if "caption" in img_feat:
-                # Extract keywords from caption
-                caption_words = img_feat["caption"].lower().split()
-                important_words = [
-                    w for w in caption_words 
-                    if len(w) > 3 and w not in ['with', 'this', 'that', 'from']
-                ]
-                keywords.update(important_words[:5])
+        # From images (object tags and caption keywords)
+        keywords.update(image_summary["objects"])
+        keywords.update(image_summary["caption_keywords"])
         
         return list(keywords)[:20]
     
     def _calculate_confidence(
         self, 
         text_features: Dict, 
-        image_features: List[Dict]
+        image_summary: Dict[str, Any]
     ) -> Dict[str, float]:
         """
         Calculate confidence scores for different aspects
@@ -189,22 +231,16 @@ class MultimodalFusion:
         
         # Text confidence based on entity scores
         if "entities" in text_features and text_features["entities"]:
-            avg_entity_score = np.mean([e["score"] for e in text_features["entities"]])
-            confidence["text_extraction"] = float(avg_entity_score)
+            # fmean avoids converting a handful of scores into a numpy array
+            confidence["text_extraction"] = fmean(e["score"] for e in text_features["entities"])
         else:
             confidence["text_extraction"] = 0.5
         
         # Image confidence based on presence of features
-        if image_features:
-            img_score = 0
-            for img_feat in image_features:
-                if "caption" in img_feat:
-                    img_score += 0.3
-                if "dominant_colors" in img_feat:
-                    img_score += 0.3
-                if "object_tags" in img_feat:
-                    img_score += 0.4
-            confidence["image_extraction"] = min(img_score / len(image_features), 1.0)
+        if image_summary["image_count"]:
+            confidence["image_extraction"] = min(
+                image_summary["score"] / image_summary["image_count"], 1.0
+            )
         else:
             confidence["image_extraction"] = 0.0
         
@@ -1,51 +1,488 @@
+import gc
+import importlib.util
+import logging
+import os
+import threading
 import torch
+from collections import OrderedDict
 from functools import lru_cache
-from typing import Tuple, Any
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Any
 
+import numpy as np
 
-def get_device():
+logger = logging.getLogger(__name__)
+
+# low_cpu_mem_usage loading needs accelerate (optional, falls back to a regular load)
+ACCELERATE_AVAILABLE = importlib.util.find_spec("accelerate") is not None
+
+# Persist inductor artifacts so compiled kernels survive restarts
+os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", os.path.expanduser("~/.cache/autolist/inductor"))
+
+# Load CUDA kernels on first use instead of all at context creation (the default
+# from CUDA 12.2 on); must be set before the CUDA context exists
+os.environ.setdefault("CUDA_MODULE_LOADING", "LAZY")
+
+
+@lru_cache(maxsize=1)
+def get_device() -> "torch.device":
+    """
+    Inference device, probed once; every caller shares the same torch.device object
+    """
     if torch.cuda.is_available():
         return torch.device("cuda")
-    try:
-        if torch.backends.mps.is_available():
-            return torch.device("mps")
-    except Exception:
-        # Older torch builds may not expose mps backend
-        pass
+    # Older torch builds may not expose the mps backend
+    mps = getattr(torch.backends, "mps", None)
+    if mps is not None and mps.is_available():
+        return torch.device("mps")
     return torch.device("cpu")
 
 
-@lru_cache(maxsize=1)
-def get_sentence_transformer(model_name: str = "all-MiniLM-L6-v2"):
+# Every loader places its model here and it stays resident
+_DEVICE = get_device()
+
+# Fixed-size BLIP/CLIP inputs let cuDNN benchmark once and reuse the fastest kernels
+torch.backends.cudnn.benchmark = True
+
+
+def _parse_torch_threads() -> int:
+    """
+    AUTOLIST_TORCH_THREADS, or half the CPU cores when unset or invalid
+    """
+    default = max(1, (os.cpu_count() or 2) // 2)
+    raw = os.getenv("AUTOLIST_TORCH_THREADS", "").strip()
+    if not raw:
+        return default
+    try:
+        threads = int(raw)
+    except ValueError:
+        threads = 0
+    if threads < 1:
+        logger.warning("Ignoring invalid AUTOLIST_TORCH_THREADS=%r; using %d threads", raw, default)
+        return default
+    return threads
+
+
+def configure_cpu_threads() -> None:
+    """
+    On CPU, give the models half the cores by default so the image-analysis threads
+    running next to them are not starved; AUTOLIST_TORCH_THREADS overrides. Called
+    at startup rather than on import, since it changes process-wide torch state.
+    """
+    if _DEVICE.type == "cpu":
+        torch.set_num_threads(_parse_torch_threads())
+
+
+def _inference_dtype(device) -> "torch.dtype":
+    # Half precision only where it is fast; CPU and MPS kernels stay in fp32
+    return torch.float16 if device.type == "cuda" else torch.float32
+
+
+def _pretrained_kwargs() -> Dict[str, Any]:
+    """
+    from_pretrained options shared by every loader: weights are created directly in
+    the inference dtype and, with accelerate, streamed in without a full fp32 copy
+    first. safetensors checkpoints (memory-mapped) are already preferred by default.
+    """
+    kwargs = {"torch_dtype": _inference_dtype(_DEVICE)}
+    if ACCELERATE_AVAILABLE:
+        kwargs["low_cpu_mem_usage"] = True
+    return kwargs
+
+
+def _from_pretrained(model_class, model_name: str):
+    """
+    model_class.from_pretrained with _pretrained_kwargs. Weights the checkpoint does
+    not provide (e.g. the classification head missing from roberta-base) can be left
+    on the meta device by a low_cpu_mem_usage load; the model is then loaded again
+    without it so those weights get initialised.
+    """
+    kwargs = _pretrained_kwargs()
+    model = model_class.from_pretrained(model_name, **kwargs)
+    if kwargs.pop("low_cpu_mem_usage", False) and any(p.is_meta for p in model.parameters()):
+        logger.info("Reloading %s without low_cpu_mem_usage: weights left uninitialised", model_name)
+        model = model_class.from_pretrained(model_name, **kwargs)
+    return model
+
+
+def _place(model):
+    """
+    Move a freshly loaded model to the inference device and dtype once, in eval mode
+    """
+    return model.to(device=_DEVICE, dtype=_inference_dtype(_DEVICE)).eval()
+
+
+def _compile(*modules) -> None:
+    """
+    Compile transformer blocks in place, once, at load time. Opt-in with
+    AUTOLIST_TORCH_COMPILE=1, and CUDA only, since reduce-overhead relies on CUDA graphs.
+    """
+    if _DEVICE.type != "cuda" or os.getenv("AUTOLIST_TORCH_COMPILE", "0") != "1":
+        return
+    for module in modules:
+        module.compile(mode="reduce-overhead", dynamic=True)
+
+
+def _quantize(model):
+    """
+    Dynamic int8 quantization of the Linear layers for CPU inference (fbgemm uses
+    VNNI int8 dot products where available). AUTOLIST_QUANTIZE=0 opts out.
+    torch.ao.quantization is slated for removal in torch 2.10, which is why torch
+    stays pinned to 2.9 in requirements.txt until this moves to torchao.
+    """
+    if _DEVICE.type != "cpu" or os.getenv("AUTOLIST_QUANTIZE", "1") == "0":
+        return model
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def move_inputs(inputs, model) -> Dict[str, Any]:
+    """
+    Move processor/tokenizer outputs onto the model's device; floating tensors
+    (pixel values) take the model's dtype, integer ids keep theirs. On CUDA the
+    host tensors are pinned so the copies run asynchronously on the stream.
+    """
+    device, dtype = model.device, model.dtype
+    pin = device.type == "cuda"
+    moved = {}
+    for k, v in inputs.items():
+        if not torch.is_tensor(v):
+            moved[k] = v
+            continue
+        if pin and v.device.type == "cpu":
+            v = v.pin_memory()
+        moved[k] = v.to(device=device, dtype=dtype if v.is_floating_point() else v.dtype, non_blocking=pin)
+    return moved
+
+
+# Loaded models keyed by (kind, model_name), least recently used first; kinds match
+# the AUTOLIST_PRELOAD names
+_models: "OrderedDict[Tuple[str, str], Any]" = OrderedDict()
+_models_lock = threading.Lock()
+
+def _parse_vram_limit() -> Optional[float]:
+    """
+    AUTOLIST_VRAM_LIMIT_MB in bytes; None (no limit) when unset or invalid
+    """
+    raw = os.getenv("AUTOLIST_VRAM_LIMIT_MB", "").strip()
+    if not raw:
+        return None
+    try:
+        limit_mb = float(raw)
+    except ValueError:
+        limit_mb = 0
+    if limit_mb <= 0:
+        logger.warning("Ignoring invalid AUTOLIST_VRAM_LIMIT_MB=%r; expected a positive number of MB", raw)
+        return None
+    return limit_mb * 1024 * 1024
+
+
+# Reserved CUDA memory above which loading another model first evicts the least
+# recently used ones (None: no limit)
+_VRAM_LIMIT_BYTES = _parse_vram_limit()
+
+
+def _singleton(key: Tuple[str, str], factory: Callable[[], Any]) -> Any:
+    """
+    Return the cached model for key, loading it exactly once even when several
+    threads ask for it at the same time
+    """
+    model = _models.get(key)
+    if model is not None:
+        try:
+            _models.move_to_end(key)
+        except KeyError:
+            # Evicted concurrently; the reference we hold is still usable
+            pass
+        return model
+
+    with _models_lock:
+        model = _models.get(key)
+        if model is None:
+            _evict_for_load(key)
+            model = _models[key] = factory()
+    return model
+
+
+def _evict_for_load(key: Tuple[str, str]) -> None:
+    """
+    Evict least recently used models while reserved VRAM is over the limit.
+    Called with _models_lock held.
+    """
+    if _VRAM_LIMIT_BYTES is None or not torch.cuda.is_available():
+        return
+    while _models and torch.cuda.memory_reserved() > _VRAM_LIMIT_BYTES:
+        lru_key = next(iter(_models))
+        logger.info("Evicting %s/%s to stay under the VRAM limit before loading %s/%s", *lru_key, *key)
+        _drop([lru_key])
+
+
+def _drop(keys: List[Tuple[str, str]]) -> None:
+    """
+    Remove models from the cache and give their memory back. Called with _models_lock held.
+    """
+    for key in keys:
+        del _models[key]
+    if any(kind == "clip" for kind, _ in keys):
+        get_clip_text_embeddings.cache_clear()
+
+    gc.collect()
+    if torch.cuda.is_available():
+        # Hand the freed blocks back to the driver instead of keeping them in torch's cache
+        torch.cuda.empty_cache()
+        torch.cuda.ipc_collect()
+
+
+def loaded_models() -> List[Tuple[str, str]]:
+    """
+    (kind, model_name) of every cached model, least recently used first
+    """
+    return list(_models)
+
+
+def unload(kind: str, model_name: Optional[str] = None) -> bool:
+    """
+    Drop cached models of a kind (all names unless model_name is given) and
+    release their memory. Returns False if nothing was loaded. Weights stay
+    alive while a caller still holds its own reference to them.
+    """
+    with _models_lock:
+        keys = [key for key in _models if key[0] == kind and model_name in (None, key[1])]
+        if not keys:
+            return False
+        _drop(keys)
+    return True
+
+
+def _load_sentence_transformer(model_name: str):
     from sentence_transformers import SentenceTransformer
-    return SentenceTransformer(model_name)
+    model = SentenceTransformer(model_name, device=str(_DEVICE), model_kwargs=_pretrained_kwargs())
+    # Still a SentenceTransformer after quantization, so encode() callers are unchanged
+    return _quantize(model.eval())
 
 
-@lru_cache(maxsize=1)
-def get_blip_models(model_name: str = "Salesforce/blip-image-captioning-base") -> Tuple[Any, Any]:
+def _load_blip_models(model_name: str) -> Tuple[Any, Any]:
     from transformers import BlipProcessor, BlipForConditionalGeneration
     processor = BlipProcessor.from_pretrained(model_name)
-    model = BlipForConditionalGeneration.from_pretrained(model_name)
+    model = _place(_from_pretrained(BlipForConditionalGeneration, model_name))
+    # Only the vision encoder: the text decoder runs inside generate() with a growing
+    # KV cache, where CUDA graphs would re-record for every sequence length
+    _compile(model.vision_model)
     return processor, model
 
 
-@lru_cache(maxsize=1)
-def get_clip_models(model_name: str = "openai/clip-vit-base-patch32") -> Tuple[Any, Any]:
+def _load_clip_models(model_name: str) -> Tuple[Any, Any]:
     from transformers import CLIPProcessor, CLIPModel
     processor = CLIPProcessor.from_pretrained(model_name)
-    model = CLIPModel.from_pretrained(model_name)
+    model = _place(_from_pretrained(CLIPModel, model_name))
+    # Covers forward as well as get_image_features/get_text_features
+    _compile(model.vision_model, model.text_model)
     return processor, model
 
 
-@lru_cache(maxsize=1)
-def get_ner_pipeline(model_name: str = "dbmdz/bert-large-cased-finetuned-conll03-english"):
-    from transformers import pipeline
-    return pipeline("ner", model=model_name, aggregation_strategy="simple")
+def _load_ner_pipeline(model_name: str) -> Tuple[Any, Any]:
+    from transformers import AutoTokenizer, AutoModelForTokenClassification
+    # Fast tokenizer: ner_batch needs offset mappings
+    tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=True)
+    model = _quantize(_place(_from_pretrained(AutoModelForTokenClassification, model_name)))
+    return tokenizer, model
 
 
-@lru_cache(maxsize=1)
-def get_roberta_model_and_tokenizer(model_name: str = "roberta-base"):
+def _load_roberta_model_and_tokenizer(model_name: str) -> Tuple[Any, Any]:
     from transformers import AutoTokenizer, AutoModelForSequenceClassification
     tokenizer = AutoTokenizer.from_pretrained(model_name)
-    model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    model = _quantize(_place(_from_pretrained(AutoModelForSequenceClassification, model_name)))
+    _compile(model)
     return tokenizer, model
+
+
+def get_sentence_transformer(model_name: str = "all-MiniLM-L6-v2"):
+    return _singleton(("sbert", model_name), lambda: _load_sentence_transformer(model_name))
+
+
+def embed_batch(texts: List[str], batch_size: int = 64, normalize: bool = True):
+    """
+    Sentence embeddings for a list of texts in batched forward passes; use this
+    instead of encoding strings one at a time. Returns an (n, dim) numpy array,
+    L2-normalized unless normalize is False.
+    """
+    model = get_sentence_transformer()
+    with torch.inference_mode():
+        return model.encode(texts, batch_size=batch_size, convert_to_numpy=True,
+                            normalize_embeddings=normalize, show_progress_bar=False)
+
+
+def get_blip_models(model_name: str = "Salesforce/blip-image-captioning-base") -> Tuple[Any, Any]:
+    return _singleton(("blip", model_name), lambda: _load_blip_models(model_name))
+
+
+def get_clip_models(model_name: str = "openai/clip-vit-base-patch32") -> Tuple[Any, Any]:
+    return _singleton(("clip", model_name), lambda: _load_clip_models(model_name))
+
+
+@lru_cache(maxsize=8)
+def get_clip_text_embeddings(labels: Tuple[str, ...],
+                             model_name: str = "openai/clip-vit-base-patch32") -> "torch.Tensor":
+    """
+    L2-normalized CLIP text embeddings (one row per label) for a fixed label set.
+    Tokenized and encoded once, then reused on the device by every request.
+    """
+    processor, model = get_clip_models(model_name)
+    inputs = processor(text=list(labels), return_tensors="pt", padding=True)
+    with torch.inference_mode():
+        text_embeds = model.get_text_features(**move_inputs(inputs, model))
+    return text_embeds / text_embeds.norm(dim=-1, keepdim=True)
+
+
+def get_ner_pipeline(model_name: str = "dbmdz/bert-large-cased-finetuned-conll03-english") -> Tuple[Any, Any]:
+    """
+    (tokenizer, token-classification model) for NER; run it through ner_batch
+    """
+    return _singleton(("ner", model_name), lambda: _load_ner_pipeline(model_name))
+
+
+def ner_batch(texts: List[str], batch_size: int = 32,
+              model_name: str = "dbmdz/bert-large-cased-finetuned-conll03-english") -> List[List[Dict]]:
+    """
+    Named entities for a list of texts, in padded forward passes of up to batch_size
+    texts. Entities are grouped like the "simple" aggregation of the transformers
+    NER pipeline: dicts with entity_group, score, word, start and end.
+    """
+    if not texts:
+        return []
+    tokenizer, model = get_ner_pipeline(model_name)
+    label_types, label_begins = _ner_label_tables(model.config.id2label)
+    entities = []
+    for start in range(0, len(texts), batch_size):
+        entities.extend(_ner_forward(texts[start:start + batch_size], tokenizer, model, label_types, label_begins))
+    return entities
+
+
+def _ner_forward(texts: List[str], tokenizer, model, label_types: np.ndarray,
+                 label_begins: np.ndarray) -> List[List[Dict]]:
+    """
+    One padded NER forward pass over texts, merged into entities per text
+    """
+    enc = tokenizer(texts, return_tensors="pt", padding=True, truncation=True, return_offsets_mapping=True)
+    offsets = enc.pop("offset_mapping").numpy()
+    with torch.inference_mode():
+        logits = model(**move_inputs(enc, model)).logits
+        probs = logits.float().softmax(-1)
+        scores, labels = probs.max(-1)
+    scores, labels = scores.cpu().numpy(), labels.cpu().numpy()
+    return [
+        _merge_bio(text, labels[i], scores[i], offsets[i], label_types, label_begins)
+        for i, text in enumerate(texts)
+    ]
+
+
+def _ner_label_tables(id2label: Dict[int, str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Per label id: the entity type without its B-/I- prefix ("" for O), and
+    whether the label opens a new entity
+    """
+    names = [id2label[i] for i in range(len(id2label))]
+    types = np.array(["" if name == "O" else name.split("-", 1)[-1] for name in names], dtype=object)
+    begins = np.array([name.startswith("B-") for name in names])
+    return types, begins
+
+
+def _merge_bio(text: str, labels: np.ndarray, scores: np.ndarray, offsets: np.ndarray,
+               label_types: np.ndarray, label_begins: np.ndarray) -> List[Dict]:
+    """
+    Group consecutive tokens of the same entity type into spans of text. A B- label
+    starts a new span; special and padding tokens (empty offsets) and O are skipped.
+    """
+    types = label_types[labels]
+    keep = (offsets[:, 1] > offsets[:, 0]) & (types != "")
+    if not keep.any():
+        return []
+    types, begins = types[keep], label_begins[labels[keep]]
+    scores, offsets = scores[keep], offsets[keep]
+    positions = np.flatnonzero(keep)
+
+    # A span starts wherever the type changes, a B- label appears, or a skipped token sits in between
+    new_span = np.ones(len(types), dtype=bool)
+    new_span[1:] = (types[1:] != types[:-1]) | begins[1:] | (np.diff(positions) > 1)
+    starts = np.flatnonzero(new_span)
+    ends = np.append(starts[1:], len(types)) - 1
+    mean_scores = np.add.reduceat(scores, starts) / (ends - starts + 1)
+
+    return [
+        {
+            "entity_group": types[first],
+            "score": float(score),
+            "word": text[offsets[first, 0]:offsets[last, 1]],
+            "start": int(offsets[first, 0]),
+            "end": int(offsets[last, 1]),
+        }
+        for first, last, score in zip(starts, ends, mean_scores)
+    ]
+
+
+def get_roberta_model_and_tokenizer(model_name: str = "roberta-base"):
+    return _singleton(("roberta", model_name), lambda: _load_roberta_model_and_tokenizer(model_name))
+
+
+def _warm_sentence_transformer():
+    get_sentence_transformer().encode(["warmup"], show_progress_bar=False)
+
+
+def _warm_ner_pipeline():
+    ner_batch(["warmup"])
+
+
+def _warm_blip_models():
+    from PIL import Image
+    processor, model = get_blip_models()
+    inputs = processor(Image.new("RGB", (224, 224)), return_tensors="pt")
+    model.generate(**move_inputs(inputs, model), max_length=5)
+
+
+def _warm_clip_models():
+    from PIL import Image
+    processor, model = get_clip_models()
+    inputs = processor(text=["warmup"], images=Image.new("RGB", (224, 224)), return_tensors="pt", padding=True)
+    model(**move_inputs(inputs, model))
+
+
+def _warm_roberta_model_and_tokenizer():
+    tokenizer, model = get_roberta_model_and_tokenizer()
+    model(**move_inputs(tokenizer("warmup", return_tensors="pt"), model))
+
+
+# Loader name -> load + one dummy forward pass (selects kernels before real traffic)
+_WARMERS: Dict[str, Callable[[], None]] = {
+    "sbert": _warm_sentence_transformer,
+    "ner": _warm_ner_pipeline,
+    "blip": _warm_blip_models,
+    "clip": _warm_clip_models,
+    "roberta": _warm_roberta_model_and_tokenizer,
+}
+
+# Models the request path uses; roberta is only preloaded when asked for
+_DEFAULT_PRELOAD = ("sbert", "ner", "blip", "clip")
+
+
+def warmup(models: Optional[Iterable[str]] = None) -> None:
+    """
+    Populate the loader caches ahead of the first request.
+
+    models defaults to the comma-separated AUTOLIST_PRELOAD env var
+    (e.g. "blip,clip,ner"; "all" or unset for the defaults, "none" to skip).
+    A model that fails to load is logged and left to load lazily.
+    """
+    if models is None:
+        preload = os.getenv("AUTOLIST_PRELOAD", "all").strip().lower()
+        if preload in ("", "none"):
+            return
+        models = _DEFAULT_PRELOAD if preload == "all" else [name.strip() for name in preload.split(",")]
+
+    for name in models:
+        warmer = _WARMERS.get(name)
+        if warmer is None:
+            logger.warning("Unknown model %r in preload list", name)
+            continue
+        try:
+            with torch.inference_mode():
+                warmer()
+        except Exception:
+            logger.warning("Preloading %s failed; it will load on first use", name, exc_info=True)
@@ -0,0 +1,155 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Micro-batching window: how many requests to coalesce, and how long to wait for them
+MAX_BATCH_SIZE = 16
+MAX_WAIT_MS = 10
+
+
+class ModelQueue:
+    """
+    Runs model-bound jobs one at a time on a single background consumer, so
+    concurrent requests take turns on the models instead of contending for them.
+    Batched jobs that arrive close together are coalesced into one call.
+    """
+
+    def __init__(self, max_batch_size: int = MAX_BATCH_SIZE, max_wait_ms: float = MAX_WAIT_MS):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._consumer: Optional[asyncio.Task] = None
+        # Jobs pulled off the queue while filling a batch they did not belong to
+        self._pending: deque = deque()
+        # Jobs taken by the consumer and not yet resolved (the running job or batch)
+        self._active: list = []
+
+    @property
+    def running(self) -> bool:
+        return self._consumer is not None and not self._consumer.done()
+
+    def start(self) -> None:
+        """
+        Start the consumer task on the running event loop
+        """
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._consumer = asyncio.create_task(self._serve())
+
+    async def stop(self) -> None:
+        """
+        Cancel the consumer. Every job not yet resolved is cancelled with it, including
+        one still running in its worker thread, so no caller is left waiting.
+        """
+        if self._consumer is None:
+            return
+        self._consumer.cancel()
+        try:
+            await self._consumer
+        except asyncio.CancelledError:
+            pass
+        while not self._queue.empty():
+            self._pending.append(self._queue.get_nowait())
+        for _, _, future, _ in [*self._active, *self._pending]:
+            future.cancel()
+        self._active = []
+        self._pending.clear()
+        self._consumer = None
+        self._queue = None
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Queue func(*args) and wait for its result. The job runs in a worker
+        thread so the event loop stays free for other requests meanwhile.
+        Without a started consumer (e.g. no lifespan) the job runs directly.
+        """
+        if not self.running:
+            return await asyncio.to_thread(func, *args)
+        return await self._submit(func, args, batched=False)
+
+    async def run_batched(self, batch_func: Callable[[List[Any]], List[Any]], item: Any) -> Any:
+        """
+        Queue one item for batch_func, which maps a list of items to a list of
+        results. Items queued for the same batch_func within the batching window
+        share a single call; each caller gets back its own result.
+        """
+        if not self.running:
+            return (await asyncio.to_thread(batch_func, [item]))[0]
+        return await self._submit(batch_func, item, batched=True)
+
+    async def _submit(self, func: Callable, payload: Any, batched: bool) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((func, payload, future, batched))
+        return await future
+
+    async def _next_job(self):
+        if self._pending:
+            return self._pending.popleft()
+        return await self._queue.get()
+
+    async def _collect_batch(self, first) -> list:
+        """
+        Gather jobs for the same batch function until the batch is full or the window closes
+        """
+        # Collected straight into _active (which already holds first) so stop() sees them
+        batch = self._active
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if self._pending:
+                job = self._pending.popleft()
+            else:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    job = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            if job[3] and job[0] is first[0]:
+                batch.append(job)
+            else:
+                # Keep arrival order: the first job of another kind ends this batch
+                self._pending.appendleft(job)
+                break
+        return batch
+
+    async def _serve(self) -> None:
+        while True:
+            self._active = []
+            job = await self._next_job()
+            self._active.append(job)
+            func, payload, future, batched = job
+            if not batched:
+                if future.cancelled():
+                    continue
+                try:
+                    result = await asyncio.to_thread(func, *payload)
+                except Exception as e:
+                    if not future.cancelled():
+                        future.set_exception(e)
+                else:
+                    if not future.cancelled():
+                        future.set_result(result)
+                continue
+
+            batch = [job for job in await self._collect_batch(job) if not job[2].cancelled()]
+            if not batch:
+                continue
+            logger.debug("Running batch of %d items", len(batch))
+            try:
+                results = await asyncio.to_thread(func, [job[1] for job in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"batch function returned {len(results)} results for {len(batch)} items")
+            except Exception as e:
+                for _, _, future, _ in batch:
+                    if not future.cancelled():
+                        future.set_exception(e)
+                continue
+            for (_, _, future, _), result in zip(batch, results):
+                if not future.cancelled():
+                    future.set_result(result)
@@ -0,0 +1,88 @@
+import re
+from typing import Iterable, List, Set
+
+# Aho-Corasick automaton (optional, falls back to per-phrase scanning)
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+
+class PhraseMatcher:
+    """
+    Matches a fixed vocabulary of phrases against text in a single pass
+    """
+
+    def __init__(self, phrases: Iterable[str]):
+        self.phrases = list(phrases)
+        self._automaton = None
+
+        if AHOCORASICK_AVAILABLE and self.phrases:
+            self._automaton = ahocorasick.Automaton()
+            for phrase in self.phrases:
+                self._automaton.add_word(phrase.lower(), phrase)
+            self._automaton.make_automaton()
+
+        # Single-pass fallback: a zero-width lookahead reports a match at every
+        # position, longest phrase first, so overlapping phrases are still seen
+        lowered = sorted({phrase.lower() for phrase in self.phrases}, key=len, reverse=True)
+        self._find_pattern = re.compile(
+            "(?=(" + "|".join(map(re.escape, lowered)) + "))"
+        ) if lowered else None
+
+        # Word-bounded pattern used for removal when the automaton is unavailable
+        self._strip_patterns = [
+            re.compile(rf"\b{re.escape(phrase)}\b", re.IGNORECASE) for phrase in self.phrases
+        ]
+
+    def find_all(self, text: str) -> List[str]:
+        """
+        Return the phrases contained in text (case-insensitive), in vocabulary order
+        """
+        text_lower = text.lower()
+
+        if self._automaton is not None:
+            hits = {phrase for _, phrase in self._automaton.iter(text_lower)}
+            return [phrase for phrase in self.phrases if phrase in hits]
+
+        if self._find_pattern is None:
+            return []
+
+        # Each hit is the longest phrase starting at its position; shorter
+        # phrases found at the same position are its prefixes
+        hits = set(self._find_pattern.findall(text_lower))
+        return [
+            phrase for phrase in self.phrases
+            if any(hit.startswith(phrase.lower()) for hit in hits)
+        ]
+
+    def strip(self, text: str) -> str:
+        """
+        Remove whole-word occurrences of every phrase from text, one phrase at a
+        time in vocabulary order (each removal can change what later phrases match)
+        """
+        # Lowercasing can change length for some characters; the automaton's view of
+        # the text would no longer match what the case-insensitive patterns see
+        if self._automaton is None or len(text.lower()) != len(text):
+            for pattern in self._strip_patterns:
+                text = pattern.sub('', text)
+            return text
+
+        # Only phrases the automaton finds can match, so the other patterns are skipped
+        present = self._present(text)
+        for phrase, pattern in zip(self.phrases, self._strip_patterns):
+            if phrase.lower() not in present:
+                continue
+            stripped = pattern.sub('', text)
+            if stripped != text:
+                text = stripped
+                # Joining the text around a removal can form phrases that were not there before
+                present = self._present(text)
+        return text
+
+    def _present(self, text: str) -> Set[str]:
+        """
+        Lowercased phrases occurring anywhere in text
+        """
+        return {phrase.lower() for _, phrase in self._automaton.iter(text.lower())}
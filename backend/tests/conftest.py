@@ -0,0 +1,16 @@
+import os
+
+# Skip model preloading at startup; tests mock the extractors instead
+os.environ.setdefault("AUTOLIST_TEST_MODE", "1")
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+@pytest.fixture(scope="session")
+def client():
+    # Entering the client runs the lifespan once for the whole session
+    with TestClient(app) as test_client:
+        yield test_client
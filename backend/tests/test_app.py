@@ -1,19 +1,23 @@
 import json
+import os
+import queue
+import numpy as np
 import pytest
-from fastapi.testclient import TestClient
 from unittest.mock import patch, MagicMock
 
-from app.main import app
+from app.utils.lazy_loader import (
+    _DEVICE, _inference_dtype, _merge_bio, _ner_label_tables, _parse_torch_threads, get_blip_models,
+    get_clip_models, get_ner_pipeline, get_roberta_model_and_tokenizer, ner_batch, unload,
+)
+from app.utils.phrase_matcher import PhraseMatcher
 
-client = TestClient(app)
 
-
-def test_root_redirect():
+def test_root_redirect(client):
     resp = client.get("/")
     assert resp.status_code in (200, 307, 308)
 
 
-def test_get_categories():
+def test_get_categories(client):
     resp = client.get("/categories")
     assert resp.status_code == 200
     data = resp.json()
@@ -22,7 +26,7 @@ def test_get_categories():
 
 @patch("app.main.text_extractor")
 @patch("app.main.listing_generator")
-def test_generate_listing_json(mock_generator, mock_extractor):
+def test_generate_listing_json(mock_generator, mock_extractor, client):
     mock_extractor.extract_features.return_value = {
         "keywords": ["test"],
         "entities": [],
@@ -43,3 +47,208 @@ def test_generate_listing_json(mock_generator, mock_extractor):
     assert resp.status_code == 200
     body = resp.json()
     assert body.get("success") is True
+
+
+@patch("app.main.text_extractor")
+@patch("app.main.listing_generator")
+def test_generate_listing_batch(mock_generator, mock_extractor, client):
+    mock_extractor.extract_features_batch.return_value = [
+        {"keywords": ["test"], "entities": [], "pattern_features": {}},
+        {"keywords": ["other"], "entities": [], "pattern_features": {}}
+    ]
+    mock_generator.generate.return_value = {
+        "title": "Test Product",
+        "bullets": ["Feature 1"],
+        "description": "Test description",
+        "search_terms": ["test"],
+        "attributes": {}
+    }
+
+    resp = client.post(
+        "/generate_batch",
+        json={"posts": [
+            {"text_content": "Test product post one", "detected_category": "water_bottle", "auto_fix_compliance": False},
+            {"text_content": "Test product post two", "detected_category": "coffee_mug", "auto_fix_compliance": False}
+        ]}
+    )
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["successful"] == 2
+    assert [listing["category"] for listing in body["listings"]] == ["water_bottle", "coffee_mug"]
+    mock_extractor.extract_features_batch.assert_called_once_with(
+        ["Test product post one", "Test product post two"]
+    )
+
+
+@patch("app.main.text_extractor")
+def test_generate_batch_rejects_oversized_batches(mock_extractor, client):
+    post = {"text_content": "Test product post", "detected_category": "water_bottle"}
+    resp = client.post("/generate_batch", json={"posts": [post] * 101})
+    assert resp.status_code == 422
+    mock_extractor.extract_features_batch.assert_not_called()
+
+
+@pytest.mark.parametrize("loader, kind, model_class, processor_class", [
+    (get_blip_models, "blip", "BlipForConditionalGeneration", "BlipProcessor"),
+    (get_clip_models, "clip", "CLIPModel", "CLIPProcessor"),
+])
+def test_loaders_return_cached_device_resident_models(loader, kind, model_class, processor_class):
+    model = MagicMock()
+    model.to.return_value = model
+    model.eval.return_value = model
+    unload(kind)
+    try:
+        with patch(f"transformers.{model_class}.from_pretrained", return_value=model) as load_model, \
+                patch(f"transformers.{processor_class}.from_pretrained"):
+            first = loader()
+            second = loader()
+        assert first is second
+        assert first[1] is model
+        load_model.assert_called_once()
+        # Placed on the device once inside the loader, never again by callers
+        model.to.assert_called_once_with(device=_DEVICE, dtype=_inference_dtype(_DEVICE))
+        assert unload(kind) is True
+        assert unload(kind) is False
+    finally:
+        unload(kind)
+
+
+class FakeStreamer:
+    """
+    Stands in for TextIteratorStreamer: text put by generate, iteration stops at end()
+    """
+
+    def __init__(self):
+        self.chunks = queue.Queue()
+        self.ended = False
+
+    def put(self, text):
+        self.chunks.put(text)
+
+    def end(self):
+        self.ended = True
+        self.chunks.put(None)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        chunk = self.chunks.get(timeout=5)
+        if chunk is None:
+            raise StopIteration
+        return chunk
+
+
+@patch("app.main.image_extractor")
+def test_caption_stream_returns_generated_text(mock_extractor, client):
+    streamer = FakeStreamer()
+
+    def generate():
+        streamer.put("a red ")
+        streamer.put("coffee mug")
+        streamer.end()
+
+    mock_extractor.caption_streamer.return_value = (streamer, generate)
+    resp = client.post("/caption/stream", files={"image": ("mug.png", b"png bytes", "image/png")})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    assert resp.text == "a red coffee mug"
+    mock_extractor.caption_streamer.assert_called_once_with(b"png bytes")
+
+
+@patch("app.main.image_extractor")
+def test_caption_stream_ends_when_generation_fails(mock_extractor, client):
+    streamer = FakeStreamer()
+
+    def generate():
+        raise RuntimeError("BLIP failed")
+
+    mock_extractor.caption_streamer.return_value = (streamer, generate)
+    resp = client.post("/caption/stream", files={"image": ("mug.png", b"png bytes", "image/png")})
+    assert resp.status_code == 200
+    assert resp.text == ""
+    # Ended by the endpoint's done-callback, not by generate
+    assert streamer.ended
+
+
+def test_admin_unload_requires_token(client, monkeypatch):
+    monkeypatch.delenv("AUTOLIST_ADMIN_TOKEN", raising=False)
+    assert client.post("/admin/unload/blip").status_code == 404
+
+    monkeypatch.setenv("AUTOLIST_ADMIN_TOKEN", "secret")
+    assert client.post("/admin/unload/blip").status_code == 403
+    assert client.post("/admin/unload/blip", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    resp = client.post("/admin/unload/blip", headers={"X-Admin-Token": "secret"})
+    assert resp.status_code == 200
+    assert resp.json()["success"] is False
+
+
+def test_roberta_loader_initialises_missing_classifier_head(tmp_path):
+    # A bare encoder checkpoint, like roberta-base: the classification head is newly initialised
+    from transformers import RobertaConfig, RobertaModel
+    config = RobertaConfig(vocab_size=50, hidden_size=16, num_hidden_layers=1, num_attention_heads=2,
+                           intermediate_size=32, max_position_embeddings=20)
+    RobertaModel(config).save_pretrained(tmp_path)
+    try:
+        with patch("transformers.AutoTokenizer.from_pretrained"):
+            _, model = get_roberta_model_and_tokenizer(str(tmp_path))
+        assert not any(param.is_meta for param in model.parameters())
+        assert model.device == _DEVICE
+    finally:
+        unload("roberta")
+
+
+@pytest.mark.parametrize("value, expected", [("3", 3), ("abc", None), ("0", None), ("", None)])
+def test_torch_threads_setting_falls_back_when_invalid(monkeypatch, value, expected):
+    monkeypatch.setenv("AUTOLIST_TORCH_THREADS", value)
+    default = max(1, (os.cpu_count() or 2) // 2)
+    assert _parse_torch_threads() == (expected or default)
+
+
+def test_ner_batch_runs_in_bounded_chunks(tmp_path, monkeypatch):
+    from transformers import BertConfig, BertForTokenClassification, BertTokenizerFast
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", "nike", "mug", "from", "london", "red"]
+    (tmp_path / "vocab.txt").write_text("\n".join(vocab))
+    BertTokenizerFast(str(tmp_path / "vocab.txt")).save_pretrained(tmp_path)
+    config = BertConfig(vocab_size=len(vocab), hidden_size=16, num_hidden_layers=1, num_attention_heads=2,
+                        intermediate_size=32, id2label={0: "O", 1: "B-ORG", 2: "I-ORG", 3: "B-LOC", 4: "I-LOC"})
+    BertForTokenClassification(config).save_pretrained(tmp_path)
+    texts = ["nike mug", "red mug from london", "london", "nike", "red nike mug from london"]
+    # int8 activation scales depend on the batch, which would shift scores between chunkings
+    monkeypatch.setenv("AUTOLIST_QUANTIZE", "0")
+    try:
+        _, model = get_ner_pipeline(str(tmp_path))
+        batch_sizes = []
+        hook = model.register_forward_hook(lambda module, args, kwargs, output: batch_sizes.append(
+            kwargs["input_ids"].shape[0]), with_kwargs=True)
+        chunked = ner_batch(texts, batch_size=2, model_name=str(tmp_path))
+        hook.remove()
+        assert batch_sizes == [2, 2, 1]
+        whole = ner_batch(texts, batch_size=len(texts), model_name=str(tmp_path))
+        assert [[(e["entity_group"], e["start"], e["end"]) for e in ents] for ents in chunked] == \
+            [[(e["entity_group"], e["start"], e["end"]) for e in ents] for ents in whole]
+        assert [e["score"] for ents in chunked for e in ents] == \
+            pytest.approx([e["score"] for ents in whole for e in ents], abs=1e-5)
+    finally:
+        unload("ner")
+
+
+def test_merge_bio_groups_entity_tokens():
+    types, begins = _ner_label_tables({0: "O", 1: "B-ORG", 2: "I-ORG", 3: "B-LOC", 4: "I-LOC"})
+    text = "Nike shoes from New York Paris"
+    # [CLS] Ni ##ke shoes from New York Paris [SEP] [PAD]
+    offsets = np.array([[0, 0], [0, 2], [2, 4], [5, 10], [11, 15], [16, 19], [20, 24], [25, 30], [0, 0], [0, 0]])
+    labels = np.array([2, 1, 2, 0, 0, 4, 4, 3, 2, 2])
+    scores = np.array([0.1, 0.9, 0.7, 0.5, 0.5, 0.8, 0.6, 0.9, 0.1, 0.1])
+    entities = _merge_bio(text, labels, scores, offsets, types, begins)
+    assert [(e["entity_group"], e["word"]) for e in entities] == [
+        ("ORG", "Nike"), ("LOC", "New York"), ("LOC", "Paris"),
+    ]
+    assert entities[0]["score"] == pytest.approx(0.8)
+
+
+def test_phrase_matcher_strips_phrases_in_vocabulary_order():
+    # Removing "best" first leaves "#1" without the word boundary it matched on
+    matcher = PhraseMatcher(["best", "#1"])
+    assert matcher.strip("Best#1 ") == "#1 "
+    assert matcher.strip("Best seller, #1 best") == " seller, #1 "
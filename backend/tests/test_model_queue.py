@@ -0,0 +1,166 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.utils.model_queue import MAX_BATCH_SIZE, ModelQueue
+
+
+def run_with_queue(scenario, **queue_kwargs):
+    """
+    Run scenario(queue) on a fresh event loop with a started queue, stopping it afterwards
+    """
+    async def main():
+        queue = ModelQueue(**queue_kwargs)
+        queue.start()
+        try:
+            return await scenario(queue)
+        finally:
+            await queue.stop()
+
+    return asyncio.run(main())
+
+
+def test_jobs_run_one_at_a_time_in_arrival_order():
+    calls = []
+    running = []
+
+    def job(index):
+        running.append(index)
+        assert len(running) == 1
+        calls.append(index)
+        running.remove(index)
+        return index * 10
+
+    async def scenario(queue):
+        return await asyncio.gather(*(queue.run(job, index) for index in range(8)))
+
+    assert run_with_queue(scenario) == [index * 10 for index in range(8)]
+    assert calls == list(range(8))
+
+
+def test_batched_items_are_coalesced_up_to_the_batch_size():
+    batches = []
+
+    def double(items):
+        batches.append(list(items))
+        return [item * 2 for item in items]
+
+    async def scenario(queue):
+        return await asyncio.gather(*(queue.run_batched(double, item) for item in range(MAX_BATCH_SIZE + 4)))
+
+    results = run_with_queue(scenario)
+    assert results == [item * 2 for item in range(MAX_BATCH_SIZE + 4)]
+    assert [len(batch) for batch in batches] == [MAX_BATCH_SIZE, 4]
+
+
+def test_items_outside_the_batching_window_run_separately():
+    batches = []
+
+    def identity(items):
+        batches.append(list(items))
+        return items
+
+    async def scenario(queue):
+        first = await queue.run_batched(identity, "a")
+        second = await queue.run_batched(identity, "b")
+        return first, second
+
+    assert run_with_queue(scenario, max_wait_ms=1) == ("a", "b")
+    assert batches == [["a"], ["b"]]
+
+
+def test_a_different_job_ends_the_batch_in_arrival_order():
+    order = []
+
+    def batch_job(items):
+        order.append(("batch", list(items)))
+        return items
+
+    def single_job():
+        order.append(("single",))
+
+    async def scenario(queue):
+        await asyncio.gather(
+            queue.run_batched(batch_job, 1),
+            queue.run(single_job),
+            queue.run_batched(batch_job, 2),
+        )
+
+    run_with_queue(scenario)
+    assert order == [("batch", [1]), ("single",), ("batch", [2])]
+
+
+def test_batch_errors_reach_every_caller():
+    def failing(items):
+        raise ValueError("model failed")
+
+    def wrong_length(items):
+        return items[:1]
+
+    async def scenario(queue):
+        failed = await asyncio.gather(*(queue.run_batched(failing, item) for item in range(3)),
+                                      return_exceptions=True)
+        short = await asyncio.gather(*(queue.run_batched(wrong_length, item) for item in range(3)),
+                                     return_exceptions=True)
+        return failed, short
+
+    failed, short = run_with_queue(scenario)
+    assert all(isinstance(error, ValueError) for error in failed)
+    assert all(isinstance(error, RuntimeError) for error in short)
+
+
+def test_cancelled_callers_are_skipped():
+    release = threading.Event()
+    calls = []
+
+    def blocking():
+        release.wait(5)
+        calls.append("blocking")
+
+    def job(name):
+        calls.append(name)
+
+    async def scenario(queue):
+        running = asyncio.create_task(queue.run(blocking))
+        await asyncio.sleep(0.05)
+        abandoned = asyncio.create_task(queue.run(job, "abandoned"))
+        kept = asyncio.create_task(queue.run(job, "kept"))
+        await asyncio.sleep(0.05)
+        abandoned.cancel()
+        release.set()
+        await asyncio.gather(running, kept)
+        with pytest.raises(asyncio.CancelledError):
+            await abandoned
+
+    run_with_queue(scenario)
+    assert calls == ["blocking", "kept"]
+
+
+def test_stop_cancels_running_and_queued_jobs():
+    release = threading.Event()
+
+    async def main():
+        queue = ModelQueue()
+        queue.start()
+        running = asyncio.create_task(queue.run(release.wait, 5))
+        await asyncio.sleep(0.05)
+        queued = asyncio.create_task(queue.run(sum, [1, 2]))
+        batched = asyncio.create_task(queue.run_batched(list, 1))
+        await asyncio.sleep(0.05)
+        await queue.stop()
+        release.set()
+        results = await asyncio.wait_for(asyncio.gather(running, queued, batched, return_exceptions=True), 1)
+        return results, queue.running
+
+    results, running = asyncio.run(main())
+    assert all(isinstance(result, asyncio.CancelledError) for result in results)
+    assert not running
+
+
+def test_jobs_run_directly_without_a_started_queue():
+    async def main():
+        queue = ModelQueue()
+        return await queue.run(sum, [1, 2]), await queue.run_batched(lambda items: [len(items)], "x")
+
+    assert asyncio.run(main()) == (3, 1)